@@ -0,0 +1,403 @@
+import asyncio
+import json
+import ssl
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from doodle_helper import (ANONYMOUS_SESSION, ASSOCLIST_CALL, DEFAULT_SESSION_TIMEOUT, PANCAKE_CALL, PANCAKE_READ_CALL,
+                           UBUS_PORT, AdaptiveTimeout, PancakeTelemetry, StationDiscovery, UbusSessionRegistry,
+                           build_call_payload, call_result, is_access_denied, pancake_contents, parse_pancake,
+                           path_timeout)
+from metrics import LOGIN_SECONDS, METRICS, RADIO_FAILURES, RADIO_POLL_SECONDS, RADIO_TIMEOUTS, VOLTAGE_READ_SECONDS
+from transport import SHARED_TRANSPORT, ResumingSSLContext, insecure_ssl_context
+
+MAX_CONCURRENCY = 100  # maximum number of radios polled at once by the asyncio backend
+
+
+class RadioHTTPError(Exception):
+    """The radio answered with an HTTP error status; the connection itself is still usable."""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class AsyncDoodleHelper:
+    """asyncio counterpart of DoodleHelper speaking the same ubus JSON-RPC calls.
+
+    Each helper keeps a single keep-alive HTTPS connection to its radio, opened
+    lazily on the first call and closed by logout(). Session tokens are shared
+    with the threaded helpers through the same UbusSessionRegistry, and TLS
+    sessions through the same ResumingSSLContext.
+    """
+
+    def __init__(self, host_ip, username, password, logger, ssl_context: Optional[ResumingSSLContext] = None,
+                 session_registry: Optional[UbusSessionRegistry] = None, port: int = UBUS_PORT):
+        self.host_ip = host_ip
+        self.port = port
+        self.url = f"https://{host_ip}/ubus" if port == UBUS_PORT else f"https://{host_ip}:{port}/ubus"
+        self.username = username
+        self.password = password
+        self.logger = logger
+        self.token = None
+        self.session_registry = session_registry
+        self._ssl_context = ssl_context or insecure_ssl_context()
+        self._file_read_denied = False
+        self.request_timeout = AdaptiveTimeout()
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _read_body(self, headers: Dict[str, str]) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip optional trailers up to the terminating empty line
+                    while (await self._reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+        if 'content-length' in headers:
+            return await self._reader.readexactly(int(headers['content-length']))
+        body = await self._reader.read()
+        await self._close_connection()
+        return body
+
+    async def _exchange(self, body: bytes) -> Dict:
+        fresh = self._writer is None
+        if fresh:
+            try:
+                self._reader, self._writer = await asyncio.open_connection(self.host_ip, self.port,
+                                                                           ssl=self._ssl_context)
+            except ssl.SSLError:
+                self._ssl_context.forget_session(self.host_ip)
+                raise
+            self._ssl_context.record_handshake(self.host_ip, self._writer.get_extra_info('ssl_object'))
+
+        self._writer.write((
+            f"POST /ubus HTTP/1.1\r\n"
+            f"Host: {self.host_ip}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n"
+        ).encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by radio")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        data = await self._read_body(headers)
+        if fresh:
+            self._remember_session(self._writer)
+        if headers.get('connection', '').lower() == 'close':
+            await self._close_connection()
+        if status != 200:
+            raise RadioHTTPError(status)
+        return json.loads(data)
+
+    async def _post(self, payload: Union[Dict, List[Dict]]) -> Union[Dict, List[Dict]]:
+        body = json.dumps(payload).encode()
+        reused = self._writer is not None
+        started = time.perf_counter()
+        try:
+            data = await asyncio.wait_for(self._exchange(body), self.request_timeout.timeout)
+            self.request_timeout.observe(time.perf_counter() - started)
+            return data
+        except asyncio.TimeoutError:
+            self.request_timeout.expired()
+            METRICS.increment(RADIO_TIMEOUTS, self.host_ip)
+            await self._close_connection()
+            raise
+        except RadioHTTPError:
+            # The whole response was read, so only a dropped connection is worth a retry
+            raise
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self._close_connection()
+            if not reused:
+                raise
+        except BaseException:
+            # A half-read response leaves the stream unusable for the next request
+            await self._close_connection()
+            raise
+        # The radio dropped the idle keep-alive connection; retry once on a fresh one
+        return await self._post(payload)
+
+    async def _call(self, ubus_object: str, method: str, arguments: Dict) -> Optional[Dict]:
+        """Make an authenticated ubus call, logging in again once if the session was rejected."""
+        data = await self._post(build_call_payload(self.token, ubus_object, method, arguments))
+        if is_access_denied(data):
+            self.logger.debug("Session for %s rejected, logging in again", self.host_ip)
+            if not await self.login(force=True):
+                return None
+            data = await self._post(build_call_payload(self.token, ubus_object, method, arguments))
+        if self.session_registry is not None and not is_access_denied(data):
+            self.session_registry.touch(self.host_ip, self.token)
+
+        return call_result(data)
+
+    async def _post_batch(self, calls: List[Tuple[str, str, Dict]]) -> Dict[int, Dict]:
+        payload = [
+            build_call_payload(self.token, ubus_object, method, arguments, request_id=request_id)
+            for request_id, (ubus_object, method, arguments) in enumerate(calls, start=1)
+        ]
+        responses = await self._post(payload)
+        if not isinstance(responses, list):
+            raise ValueError(f"Batch request rejected: {responses.get('error')}")
+        return {response.get('id'): response for response in responses}
+
+    async def call_batch(self, calls: List[Tuple[str, str, Dict]]) -> List[Optional[Dict]]:
+        """Make several authenticated ubus calls in one JSON-RPC batch POST, results in call order."""
+        responses = await self._post_batch(calls)
+        if any(is_access_denied(response) for response in responses.values()):
+            self.logger.debug("Session for %s rejected, logging in again", self.host_ip)
+            if not await self.login(force=True):
+                return [None] * len(calls)
+            responses = await self._post_batch(calls)
+        if self.session_registry is not None and not any(is_access_denied(response) for response in responses.values()):
+            self.session_registry.touch(self.host_ip, self.token)
+
+        return [call_result(responses.get(request_id)) for request_id in range(1, len(calls) + 1)]
+
+    async def login(self, force: bool = False) -> bool:
+        """Obtain a ubus session, reusing a cached token from the session registry unless forced."""
+        if self.session_registry is not None:
+            if force:
+                self.session_registry.invalidate(self.host_ip, self.token)
+            else:
+                token = self.session_registry.get(self.host_ip)
+                if token is not None:
+                    self.token = token
+                    return True
+
+        login_payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "call",
+            "params": [ANONYMOUS_SESSION, "session", "login", {"username": self.username, "password": self.password}]
+        }
+
+        try:
+            with METRICS.timer(LOGIN_SECONDS):
+                data = await self._post(login_payload)
+            if data.get("error"):
+                METRICS.increment(RADIO_FAILURES, self.host_ip)
+                self.logger.error(f"Doodle login failed: {data['error']}")
+                return False
+            self.logger.debug("Doodle login success")
+            session = data["result"][1]
+            self.token = session["ubus_rpc_session"]
+            if self.session_registry is not None:
+                self.session_registry.store(self.host_ip, self.token, session.get("expires", DEFAULT_SESSION_TIMEOUT))
+            return True
+        except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
+            self.logger.error(f"Failed to login to radio at {self.url}: {str(e)}")
+            return False
+
+    def _pancake_call(self) -> Tuple[str, str, Dict]:
+        """Read pancake.txt with file read, which spawns no process, unless the radio does not allow it."""
+        if self._file_read_denied or (self.session_registry is not None
+                                      and not self.session_registry.allows_file_read(self.host_ip)):
+            return PANCAKE_CALL
+        return PANCAKE_READ_CALL
+
+    async def _read_telemetry_with_exec(self) -> Optional[PancakeTelemetry]:
+        """Retry a failed file read with file exec, remembering the radio needs it if that works."""
+        result = await self._call(*PANCAKE_CALL)
+        if not result:
+            return None
+        self.logger.info(f"Radio at {self.host_ip} does not allow ubus file read, falling back to file exec")
+        self._file_read_denied = True
+        if self.session_registry is not None:
+            self.session_registry.deny_file_read(self.host_ip)
+        return parse_pancake(pancake_contents(result))
+
+    async def get_telemetry(self) -> Optional[PancakeTelemetry]:
+        """Read every field the Pancake board reports in one call."""
+        try:
+            with METRICS.timer(VOLTAGE_READ_SECONDS):
+                pancake_call = self._pancake_call()
+                result = await self._call(*pancake_call)
+                if result:
+                    return parse_pancake(pancake_contents(result))
+                if pancake_call is PANCAKE_READ_CALL:
+                    return await self._read_telemetry_with_exec()
+            return None
+        except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
+            self.logger.error(f"Error getting battery voltage from {self.url}: {str(e)}")
+            return None
+
+    async def get_battery_voltage(self) -> Optional[float]:
+        telemetry = await self.get_telemetry()
+        return telemetry.voltage if telemetry is not None else None
+
+    async def get_associated_stations(self) -> Optional[List[Dict]]:
+        try:
+            result = await self._call(*ASSOCLIST_CALL)
+
+            if result:
+                return result['results']
+
+            return None
+        except Exception as e:
+            self.logger.error(f"Error getting associated radios from {self.url}: {str(e)}")
+            return None
+
+    async def get_station_status(self) -> Tuple[Optional[List[Dict]], Optional[PancakeTelemetry]]:
+        """Read the association list and Pancake telemetry in a single batched round trip."""
+        pancake_call = self._pancake_call()
+        try:
+            with METRICS.timer(VOLTAGE_READ_SECONDS):
+                assoc_result, battery_result = await self.call_batch([ASSOCLIST_CALL, pancake_call])
+        except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
+            self.logger.error(f"Error getting radio status from {self.url}: {str(e)}")
+            return None, None
+
+        assoc_list = assoc_result['results'] if assoc_result else None
+        telemetry = None
+        try:
+            if battery_result:
+                telemetry = parse_pancake(pancake_contents(battery_result))
+            elif assoc_list is not None and pancake_call is PANCAKE_READ_CALL:
+                # The session is valid, so the radio refused the file read itself
+                telemetry = await self._read_telemetry_with_exec()
+        except Exception as e:
+            self.logger.error(f"Error getting battery voltage from {self.url}: {str(e)}")
+        return assoc_list, telemetry
+
+    def _remember_session(self, writer: Optional[asyncio.StreamWriter]) -> None:
+        # TLS 1.3 session tickets arrive after the handshake, so the session is only complete once a response was read
+        ssl_object = writer.get_extra_info('ssl_object') if writer is not None else None
+        if ssl_object is not None:
+            self._ssl_context.remember_session(self.host_ip, ssl_object.session)
+
+    async def _close_connection(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is None:
+            return
+        self._remember_session(writer)
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+    async def logout(self) -> None:
+        try:
+            await self._close_connection()
+            self.logger.debug("Doodle logout success")
+        except Exception as e:
+            self.logger.error(f"Error during logout: {str(e)}")
+
+
+class AsyncPollingBackend:
+    """Polls every discovered station from a single thread using asyncio.
+
+    Concurrency is bounded by a semaphore rather than a thread pool, so hundreds
+    of radios can be in flight at once. Topology discovery still happens in
+    StationDiscovery; this backend only replaces get_station_voltages. One
+    helper per radio is kept across polls so its keep-alive connection is
+    reused instead of paying a TLS handshake on every poll.
+    """
+
+    def __init__(self, station_discovery: StationDiscovery, logger, max_concurrency: int = MAX_CONCURRENCY):
+        self.station_discovery = station_discovery
+        self.logger = logger
+        self.max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        transport = station_discovery.transport if station_discovery.transport is not None else SHARED_TRANSPORT
+        # Resume the TLS sessions the threaded helpers negotiated; replay and recording transports have no context
+        self._ssl_context = getattr(transport, 'ssl_context', None) or insecure_ssl_context()
+        self._helpers: Dict[str, AsyncDoodleHelper] = {}  # {mac_address: helper holding its connection}
+
+    async def _process_station(self, mac_address: str, station_helper: AsyncDoodleHelper,
+                               semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        """Process a single station and return its voltage information."""
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                # The first call's connection doubles as the reachability probe
+                if await station_helper.login():
+                    self.station_discovery.failed_login_attempts[mac_address] = 0
+                    assoc_list, telemetry = await station_helper.get_station_status()
+                    if assoc_list is not None or telemetry is not None:
+                        self.station_discovery._record_sighting(mac_address, assoc_list)
+                    if telemetry is not None and telemetry.voltage is not None:
+                        return self.station_discovery._build_reading(mac_address, station_helper.host_ip,
+                                                                     telemetry.voltage, telemetry)
+                else:
+                    self.station_discovery._record_login_failure(mac_address)
+            except Exception as e:
+                METRICS.increment(RADIO_FAILURES, station_helper.host_ip)
+                self.logger.error(f"Error processing radio {mac_address}: {str(e)}")
+            finally:
+                METRICS.increment(RADIO_POLL_SECONDS, station_helper.host_ip, time.perf_counter() - started)
+        return None
+
+    def _helper_for(self, mac_address: str, ip_address: str, username: str, password: str) -> AsyncDoodleHelper:
+        station_helper = self._helpers.get(mac_address)
+        if station_helper is None or station_helper.host_ip != ip_address:
+            station_helper = AsyncDoodleHelper(ip_address, username, password, self.logger,
+                                               ssl_context=self._ssl_context,
+                                               session_registry=self.station_discovery.session_registry,
+                                               port=self.station_discovery.port)
+            self._helpers[mac_address] = station_helper
+        path = self.station_discovery.station_paths.get(mac_address)
+        if path is not None:
+            station_helper.request_timeout.seed(path_timeout(path.hops, path.bottleneck_snr))
+        return station_helper
+
+    async def _poll_stations(self, username, password, skip: Optional[Set[str]]) -> List[Dict]:
+        stations = dict(self.station_discovery.discovered_stations)
+        # Radios that left the topology give their connections back
+        gone = [mac for mac in self._helpers if mac not in stations]
+        await asyncio.gather(*(self._helpers.pop(mac).logout() for mac in gone))
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        station_helpers = [
+            (mac, self._helper_for(mac, ip, username, password))
+            for mac, ip in stations.items()
+            if skip is None or mac not in skip
+        ]
+        # Radios with quick, healthy paths take the semaphore first; tasks start in creation order
+        station_helpers.sort(key=lambda station_info: station_info[1].request_timeout.timeout)
+        tasks = [asyncio.ensure_future(self._process_station(mac, station_helper, semaphore))
+                 for mac, station_helper in station_helpers]
+        results = []
+        for future in asyncio.as_completed(tasks):
+            try:
+                result = await future
+            except Exception as e:
+                self.logger.error(f"Error processing radio voltage result: {str(e)}")
+                continue
+            if result is not None:
+                results.append(result)
+                if self.station_discovery.reading_callback is not None:
+                    self.station_discovery.reading_callback(result)
+        return results
+
+    def get_station_voltages(self, root_station, skip: Optional[Set[str]] = None) -> List[Dict[str, any]]:
+        """Get fresh voltage readings for all discovered stations concurrently, except those in skip."""
+        return self._loop.run_until_complete(self._poll_stations(root_station.username, root_station.password, skip))
+
+    async def _close_helpers(self) -> None:
+        helpers, self._helpers = list(self._helpers.values()), {}
+        await asyncio.gather(*(station_helper.logout() for station_helper in helpers))
+
+    def close(self) -> None:
+        self._loop.run_until_complete(self._close_helpers())
+        self._loop.close()
@@ -0,0 +1,183 @@
+"""Benchmark discovery and polling against a simulated mesh.
+
+For each mesh size this reports the time of a full topology crawl, the latency
+percentiles of full poll cycles, the ubus requests, connections and TLS
+handshakes (full and resumed) each one needs, and the peak memory traced
+during a crawl plus a poll:
+
+    python benchmark_polling.py --sizes 10 100 500 --polls 20 --latency 0.02
+"""
+import logging
+import multiprocessing
+import time
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+
+from async_doodle_helper import MAX_CONCURRENCY, AsyncPollingBackend
+from doodle_helper import DoodleHelper, StationDiscovery
+from mesh_simulator import SIMULATOR_PORT, SIMULATOR_SUBNET, SimulatedMesh
+from transport import SHARED_TRANSPORT
+
+DEFAULT_SIZES = (10, 100, 500)
+DEFAULT_POLLS = 20  # poll cycles timed per mesh size
+
+_LOGGER = logging.getLogger('benchmark_polling')
+
+
+def _serve_mesh(mesh_options: Dict, connection) -> None:
+    """Run a simulated mesh in its own process so it does not skew the client's timings or memory."""
+    mesh = SimulatedMesh(**mesh_options)
+    with mesh:
+        connection.send((mesh.root.ip_address, mesh.username, mesh.password))
+        while True:
+            command = connection.recv()
+            if command == 'stats':
+                connection.send(dict(mesh.stats))
+            elif command == 'reset':
+                mesh.reset_stats()
+            else:
+                break
+
+
+class MeshProcess:
+    """Handle on a simulated mesh served from a child process."""
+
+    def __init__(self, **mesh_options):
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_mesh, args=(mesh_options, child_connection),
+                                                daemon=True)
+
+    def __enter__(self):
+        self._process.start()
+        self.root_ip, self.username, self.password = self._connection.recv()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.send('stop')
+        self._process.join()
+
+    def reset_stats(self) -> None:
+        self._connection.send('reset')
+
+    def stats(self) -> Dict[str, int]:
+        self._connection.send('stats')
+        return self._connection.recv()
+
+
+def _new_discovery(mesh: MeshProcess, options):
+    station_discovery = StationDiscovery(_LOGGER, mesh_subnet=options.subnet, port=options.port)
+    root_station = DoodleHelper(mesh.root_ip, mesh.username, mesh.password, _LOGGER,
+                                session_registry=station_discovery.session_registry, port=options.port)
+    if options.backend == 'asyncio':
+        backend = AsyncPollingBackend(station_discovery, _LOGGER, max_concurrency=options.max_concurrency)
+    else:
+        backend = station_discovery
+    return station_discovery, root_station, backend
+
+
+def benchmark_size(radio_count: int, options) -> Dict:
+    """Crawl and poll a fresh simulated mesh of radio_count radios, returning the measurements."""
+    with MeshProcess(radio_count=radio_count, subnet=options.subnet, port=options.port, latency=options.latency,
+                     jitter=options.jitter, loss=options.loss, dead=options.dead, hung=options.hung,
+                     fanout=options.fanout, seed=options.seed) as mesh:
+        station_discovery, root_station, backend = _new_discovery(mesh, options)
+        root_station.login()
+
+        mesh.reset_stats()
+        started = time.perf_counter()
+        station_discovery.update_station_cache(root_station)
+        discovery_time = time.perf_counter() - started
+        discovery_stats = mesh.stats()
+
+        poll_times: List[float] = []
+        poll_requests: List[int] = []
+        poll_connections: List[int] = []
+        readings = 0
+        handshakes, resumptions = SHARED_TRANSPORT.handshake_counts()
+        for _ in range(options.polls):
+            mesh.reset_stats()
+            started = time.perf_counter()
+            readings = len(backend.get_station_voltages(root_station))
+            poll_times.append(time.perf_counter() - started)
+            stats = mesh.stats()
+            poll_requests.append(stats.get('requests', 0))
+            poll_connections.append(stats.get('connections', 0))
+        total_handshakes, total_resumptions = SHARED_TRANSPORT.handshake_counts()
+        poll_resumptions = total_resumptions - resumptions
+        poll_full_handshakes = total_handshakes - handshakes - poll_resumptions
+        if backend is not station_discovery:
+            backend.close()
+
+        # Memory is traced in a separate pass so tracing overhead stays out of the timings
+        station_discovery, root_station, backend = _new_discovery(mesh, options)
+        tracemalloc.start()
+        root_station.login()
+        station_discovery.update_station_cache(root_station)
+        backend.get_station_voltages(root_station)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if backend is not station_discovery:
+            backend.close()
+
+    p50, p90, p99 = np.percentile(poll_times, [50, 90, 99]) if poll_times else (float('nan'),) * 3
+    return {
+        'radios': radio_count,
+        'discovered': len(station_discovery.discovered_stations),
+        'readings': readings,
+        'discovery_s': discovery_time,
+        'discovery_requests': discovery_stats.get('requests', 0),
+        'poll_p50_s': float(p50),
+        'poll_p90_s': float(p90),
+        'poll_p99_s': float(p99),
+        'poll_requests': float(np.mean(poll_requests)) if poll_requests else 0.0,
+        'poll_connections': float(np.mean(poll_connections)) if poll_connections else 0.0,
+        'poll_full_handshakes': poll_full_handshakes / options.polls if options.polls else 0.0,
+        'poll_resumed_handshakes': poll_resumptions / options.polls if options.polls else 0.0,
+        'peak_memory_kb': peak_memory / 1024,
+    }
+
+
+def main():
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='Benchmark radio discovery and polling on a simulated mesh.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Mesh sizes to run.')
+    parser.add_argument('--polls', type=int, default=DEFAULT_POLLS, help='Poll cycles timed per mesh size.')
+    parser.add_argument('--backend', choices=('threaded', 'asyncio'), default='threaded',
+                        help='Polling backend under test.')
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY,
+                        help='Radios polled at once by the asyncio backend.')
+    parser.add_argument('--subnet', default=SIMULATOR_SUBNET, help='First two octets of the simulated radios.')
+    parser.add_argument('--port', type=int, default=SIMULATOR_PORT, help='Port the simulated radios listen on.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean seconds added to every response.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Seconds the latency varies by either way.')
+    parser.add_argument('--loss', type=float, default=0.0, help='Probability that a request is never answered.')
+    parser.add_argument('--dead', type=float, default=0.0, help='Fraction of radios that refuse connections.')
+    parser.add_argument('--hung', type=float, default=0.0, help='Fraction of radios that accept but never answer.')
+    parser.add_argument('--fanout', type=int, default=3, help='Children per radio in the mesh tree.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the topology, voltages and faults.')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per mesh size.')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    header = (f"{'radios':>6} {'found':>6} {'discovery':>10} {'disc rpc':>8} {'poll p50':>9} {'poll p90':>9} "
+              f"{'poll p99':>9} {'poll rpc':>8} {'conns':>7} {'tls full':>8} {'resumed':>8} {'peak KiB':>9}")
+    if not options.json:
+        print(header)
+    for radio_count in options.sizes:
+        result = benchmark_size(radio_count, options)
+        if options.json:
+            print(json.dumps(result))
+        else:
+            print(f"{result['radios']:>6} {result['discovered']:>6} {result['discovery_s']:>9.3f}s "
+                  f"{result['discovery_requests']:>8} {result['poll_p50_s']:>8.3f}s {result['poll_p90_s']:>8.3f}s "
+                  f"{result['poll_p99_s']:>8.3f}s {result['poll_requests']:>8.1f} {result['poll_connections']:>7.1f} "
+                  f"{result['poll_full_handshakes']:>8.1f} {result['poll_resumed_handshakes']:>8.1f} "
+                  f"{result['peak_memory_kb']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
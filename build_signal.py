@@ -7,13 +7,107 @@ doodle_battery_spec.info.order = 0
 doodle_battery_spec.sensor.resolution.value = 0.1
 doodle_battery_spec.sensor.units.name = "%"
 
-def build_signals(stations):
-    signals = {}
-    for station in stations:
-        signal = signals_pb2.Signal()
-        signal.signal_spec.CopyFrom(doodle_battery_spec)
-        signal.signal_spec.info.name = f"{station['mac_address'][-5:]}"
-        # signal.signal_data.data.string = f"{station['voltage']:.4f}V, {station['battery_percentage']:.1f}%"
-        signal.signal_data.data.double = float(station['battery_percentage'])
-        signals[station['mac_address']] = signal
-    return signals
+doodle_discharge_rate_spec = signals_pb2.SignalSpec()
+doodle_discharge_rate_spec.info.name = '<MAC> drain'
+doodle_discharge_rate_spec.info.description = 'Doodle Battery Discharge Rate'
+doodle_discharge_rate_spec.info.order = 1
+doodle_discharge_rate_spec.sensor.resolution.value = 0.1
+doodle_discharge_rate_spec.sensor.units.name = "%/h"
+
+doodle_time_to_empty_spec = signals_pb2.SignalSpec()
+doodle_time_to_empty_spec.info.name = '<MAC> empty in'
+doodle_time_to_empty_spec.info.description = 'Doodle Battery Estimated Time To Empty'
+doodle_time_to_empty_spec.info.order = 2
+doodle_time_to_empty_spec.sensor.resolution.value = 0.1
+doodle_time_to_empty_spec.sensor.units.name = "h"
+
+doodle_input_current_spec = signals_pb2.SignalSpec()
+doodle_input_current_spec.info.name = '<MAC> current'
+doodle_input_current_spec.info.description = 'Doodle Pancake Input Current'
+doodle_input_current_spec.info.order = 3
+doodle_input_current_spec.sensor.resolution.value = 0.01
+doodle_input_current_spec.sensor.units.name = "A"
+
+doodle_temperature_spec = signals_pb2.SignalSpec()
+doodle_temperature_spec.info.name = '<MAC> temp'
+doodle_temperature_spec.info.description = 'Doodle Pancake Temperature'
+doodle_temperature_spec.info.order = 4
+doodle_temperature_spec.sensor.resolution.value = 0.1
+doodle_temperature_spec.sensor.units.name = "°C"
+
+doodle_link_snr_spec = signals_pb2.SignalSpec()
+doodle_link_snr_spec.info.name = '<MAC> link'
+doodle_link_snr_spec.info.description = 'Doodle Mesh Link SNR To Parent'
+doodle_link_snr_spec.info.order = 5
+doodle_link_snr_spec.sensor.resolution.value = 1
+doodle_link_snr_spec.sensor.units.name = "dB"
+
+doodle_path_throughput_spec = signals_pb2.SignalSpec()
+doodle_path_throughput_spec.info.name = '<MAC> path'
+doodle_path_throughput_spec.info.description = 'Doodle Mesh Expected Throughput From The Root'
+doodle_path_throughput_spec.info.order = 6
+doodle_path_throughput_spec.sensor.resolution.value = 0.1
+doodle_path_throughput_spec.sensor.units.name = "Mbit/s"
+
+doodle_service_status_spec = signals_pb2.SignalSpec()
+doodle_service_status_spec.info.name = 'Service'
+doodle_service_status_spec.info.description = 'Doodle Battery Service Readiness'
+doodle_service_status_spec.info.order = 7
+
+def _build_signal(spec, name, value):
+    signal = signals_pb2.Signal()
+    signal.signal_spec.CopyFrom(spec)
+    signal.signal_spec.info.name = name
+    signal.signal_data.data.double = float(value)
+    return signal
+
+class SignalCache:
+    """Keeps one Signal per signal id across builds and only rewrites values in place.
+
+    Specs are copied and names formatted once, when an id first appears; ids
+    that disappear from the stations are dropped on the next build.
+    """
+
+    def __init__(self):
+        self._signals = {}
+        self._status_signal = signals_pb2.Signal()
+        self._status_signal.signal_spec.CopyFrom(doodle_service_status_spec)
+
+    def _update(self, signals, signal_id, spec, name, value):
+        signal = self._signals.get(signal_id)
+        if signal is None:
+            signal = _build_signal(spec, name, value)
+        else:
+            signal.signal_data.data.double = float(value)
+        signals[signal_id] = signal
+
+    def build_signals(self, stations):
+        signals = {}
+        for station in stations:
+            mac_address = station['mac_address']
+            # signal.signal_data.data.string = f"{station['voltage']:.4f}V, {station['battery_percentage']:.1f}%"
+            self._update(signals, mac_address, doodle_battery_spec, f"{mac_address[-5:]}", station['battery_percentage'])
+            if station.get('discharge_rate') is not None:
+                self._update(signals, f"{mac_address}/discharge_rate", doodle_discharge_rate_spec,
+                             f"{mac_address[-5:]} drain", station['discharge_rate'])
+            if station.get('time_to_empty') is not None:
+                self._update(signals, f"{mac_address}/time_to_empty", doodle_time_to_empty_spec,
+                             f"{mac_address[-5:]} empty in", station['time_to_empty'])
+            if station.get('input_current') is not None:
+                self._update(signals, f"{mac_address}/input_current", doodle_input_current_spec,
+                             f"{mac_address[-5:]} current", station['input_current'])
+            if station.get('temperature') is not None:
+                self._update(signals, f"{mac_address}/temperature", doodle_temperature_spec,
+                             f"{mac_address[-5:]} temp", station['temperature'])
+            if station.get('link_snr') is not None:
+                self._update(signals, f"{mac_address}/link_snr", doodle_link_snr_spec,
+                             f"{mac_address[-5:]} link", station['link_snr'])
+            if station.get('path_throughput') is not None:
+                self._update(signals, f"{mac_address}/path_throughput", doodle_path_throughput_spec,
+                             f"{mac_address[-5:]} path", station['path_throughput'])
+        self._signals = signals
+        return signals
+
+    def build_status_signal(self, readiness):
+        self._status_signal.signal_data.data.string = readiness
+        return self._status_signal
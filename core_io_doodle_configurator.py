@@ -1,196 +1,330 @@
-import tkinter as tk
-from tkinter import messagebox
+import argparse
+import csv
+import ipaddress
+import json
+import os
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional
+
 import paramiko
 
-# Function to create credentials file and run nmcli
-def configure_radio():
-    host = entry_host.get()
-    ssh_username = entry_ssh_username.get()
-    ssh_password = entry_ssh_password.get()
+CREDENTIALS_PATH = "/persist/opt/doodle_rpc_credentials"
+TEMP_CREDENTIALS_PATH = "/tmp/doodle_rpc_credentials"
+CONNECTION_NAME = "eth-robot"
+PREFIX_LENGTH = 16  # the mesh is a /16, 10.223.X.Y
+SSH_TIMEOUT = 10  # seconds allowed to connect and authenticate to a CORE I/O
+SCRIPT_TIMEOUT = 60  # seconds allowed for the remote script; nmcli con up can take a while
+MAX_PARALLEL = 8  # CORE I/Os provisioned at once in batch mode
+SSH_PASSWORD_ENV = "CORE_IO_PASSWORD"  # used for inventory rows without an ssh_password
+RADIO_PASSWORD_ENV = "DOODLE_RPC_PASSWORD"  # used for inventory rows without a radio_password
+INVENTORY_FIELDS = ('host', 'ssh_username', 'ssh_password', 'radio_ip', 'radio_username', 'radio_password',
+                    'ip_address')
+RESTART_REMINDER = "Make sure to restart the doodle_battery_service extension from CORE I/O's webpage."
+REPORT_SUFFIX = '-report.json'  # appended to the inventory name for the report of windowed builds, which have no console
 
-    radio_ip_address = entry_radio_ip.get()
-    radio_rpc_username = entry_radio_username.get()
-    radio_rpc_password = entry_radio_password.get()
-    
-    ip_address = entry_ip.get()
 
-    if not all([host, ssh_username, ssh_password, radio_rpc_username, radio_rpc_password, radio_ip_address, ip_address]):
-        messagebox.showerror("Error", "Please fill in all fields.")
-        return
+class HostResult(NamedTuple):
+    host: str
+    ok: bool
+    message: str
+    seconds: float
 
-    credentials_content = f"{radio_ip_address}\n{radio_rpc_username}\n{radio_rpc_password}\n"
-    credentials_path = "/persist/opt/doodle_rpc_credentials"
-    nmcli_mod_cmd = f"nmcli con mod eth-robot +ipv4.addresses {ip_address}/16"
-    nmcli_up_cmd = "nmcli con up eth-robot"
 
-    try:
-        # Connect via SSH
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=ssh_username, password=ssh_password)
+def _fail_on_error(command: str, step: str) -> str:
+    return f"{command} || fail {shlex.quote(step)}"
+
+
+def configure_script(ip_address: str) -> str:
+    """Shell script run as root that installs the uploaded credentials and adds the mesh address."""
+    address = shlex.quote(f"{ip_address}/{PREFIX_LENGTH}")
+    return "\n".join([
+        'fail() { echo "$1 failed" >&2; exit 1; }',
+        _fail_on_error(f"mv -f -T {TEMP_CREDENTIALS_PATH} {CREDENTIALS_PATH}", "moving credentials file"),
+        _fail_on_error(f"chmod 600 {CREDENTIALS_PATH}", "setting credentials permissions"),
+        _fail_on_error(f"nmcli con mod {CONNECTION_NAME} +ipv4.addresses {address}", "nmcli con mod"),
+        _fail_on_error(f"nmcli con up {CONNECTION_NAME}", "nmcli con up"),
+    ])
+
+
+def undo_script(ip_address: str) -> str:
+    """Shell script run as root that removes the credentials and the mesh address."""
+    address = shlex.quote(f"{ip_address}/{PREFIX_LENGTH}")
+    return "\n".join([
+        'fail() { echo "$1 failed" >&2; exit 1; }',
+        _fail_on_error(f"rm -f {CREDENTIALS_PATH}", "deleting credentials file"),
+        _fail_on_error(f"nmcli con mod {CONNECTION_NAME} -ipv4.addresses {address}", "nmcli con mod"),
+        _fail_on_error(f"nmcli con up {CONNECTION_NAME}", "nmcli con up"),
+    ])
+
 
-        # Write credentials to a temp file
-        temp_path = f"/tmp/doodle_rpc_credentials"
+def _connect(host: str, ssh_username: str, ssh_password: str) -> paramiko.SSHClient:
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh.connect(host, username=ssh_username, password=ssh_password, timeout=SSH_TIMEOUT,
+                auth_timeout=SSH_TIMEOUT, banner_timeout=SSH_TIMEOUT, look_for_keys=False, allow_agent=False)
+    return ssh
+
+
+def _run_as_root(ssh: paramiko.SSHClient, ssh_password: str, script: str) -> None:
+    """Run script through a single sudo, raising with its error output if any step failed."""
+    command = f"sudo -S -p '' sh -c {shlex.quote(script)}"
+    # A pty, as before, keeps sudo working on hosts whose sudoers set requiretty
+    stdin, stdout, stderr = ssh.exec_command(command, timeout=SCRIPT_TIMEOUT, get_pty=True)
+    stdin.write(f'{ssh_password}\n')
+    stdin.flush()
+    # Drain both streams before waiting on the exit status so a chatty command cannot stall the channel
+    output = stdout.read().decode(errors='replace')
+    error = stderr.read().decode(errors='replace')
+    if stdout.channel.recv_exit_status() != 0:
+        # The pty merges stderr into the output and echoes the password sudo read, which must not reach the report
+        message = (error or output).replace(ssh_password, '').strip()
+        raise Exception(message or "remote script failed")
+
+
+def configure_host(host: str, ssh_username: str, ssh_password: str, radio_ip_address: str,
+                   radio_rpc_username: str, radio_rpc_password: str, ip_address: str) -> None:
+    """Write the Doodle RPC credentials to a CORE I/O and give it an address on the mesh."""
+    credentials_content = f"{radio_ip_address}\n{radio_rpc_username}\n{radio_rpc_password}\n"
+    ssh = _connect(host, ssh_username, ssh_password)
+    try:
         sftp = ssh.open_sftp()
-        with sftp.file(temp_path, 'w') as f:
-            f.write(credentials_content)
-        sftp.close()
-
-        # Move credentials file to /etc with sudo and set permissions
-        move_cmd = f"sudo -S mv -f -T {temp_path} {credentials_path} && sudo -S chmod 600 {credentials_path}"
-        stdin, stdout, stderr = ssh.exec_command(move_cmd, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        stdout.channel.recv_exit_status()
-        move_err = stderr.read().decode()
-        if move_err:
-            raise Exception(f"Error moving credentials file: {move_err}")
-
-        # Run nmcli mod command
-        nmcli_mod_full = f"sudo -S {nmcli_mod_cmd}"
-        stdin, stdout, stderr = ssh.exec_command(nmcli_mod_full, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        mod_out = stdout.read().decode()
-        mod_err = stderr.read().decode()
-        if mod_err:
-            raise Exception(f"nmcli error: {mod_err}")
-
-        # Run nmcli up command
-        nmcli_up_full = f"sudo -S {nmcli_up_cmd}"
-        stdin, stdout, stderr = ssh.exec_command(nmcli_up_full, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        up_out = stdout.read().decode()
-        up_err = stderr.read().decode()
-        if up_err:
-            raise Exception(f"nmcli up error: {up_err}")
+        try:
+            with sftp.file(TEMP_CREDENTIALS_PATH, 'w') as f:
+                f.chmod(0o600)
+                f.write(credentials_content)
+        finally:
+            sftp.close()
+        _run_as_root(ssh, ssh_password, configure_script(ip_address))
+    finally:
+        ssh.close()
 
+
+def undo_host(host: str, ssh_username: str, ssh_password: str, ip_address: str) -> None:
+    """Remove the Doodle RPC credentials and the mesh address from a CORE I/O."""
+    ssh = _connect(host, ssh_username, ssh_password)
+    try:
+        _run_as_root(ssh, ssh_password, undo_script(ip_address))
+    finally:
         ssh.close()
-        messagebox.showinfo("Success", f"Configuration complete!\n\nMake sure to restart the doodle_battery_service extension from CORE I/O's webpage.")
+
+
+def load_inventory(path: str, defaults: Dict[str, Optional[str]]) -> List[Dict[str, str]]:
+    """Read a CSV inventory with one CORE I/O per row, filling blank columns from defaults."""
+    with open(path, 'r', newline='') as inventory_file:
+        rows = list(csv.DictReader(inventory_file))
+    inventory = []
+    for line, row in enumerate(rows, start=2):
+        entry = {field: (row.get(field) or '').strip() or defaults.get(field) for field in INVENTORY_FIELDS}
+        if not entry['host'] or not entry['ip_address']:
+            raise ValueError(f"{path}:{line}: every row needs a host and an ip_address")
+        try:
+            ipaddress.IPv4Address(entry['ip_address'])
+        except ValueError:
+            raise ValueError(f"{path}:{line}: {entry['ip_address']} is not an IPv4 address")
+        if any(other['host'] == entry['host'] for other in inventory):
+            # Two concurrent sessions on one CORE I/O would race on the same credentials file
+            raise ValueError(f"{path}:{line}: {entry['host']} is listed more than once")
+        inventory.append(entry)
+    return inventory
+
+
+def _provision(entry: Dict[str, str], undo: bool) -> HostResult:
+    started = time.monotonic()
+    required = ('host', 'ssh_username', 'ssh_password', 'ip_address') if undo else INVENTORY_FIELDS
+    missing = [field for field in required if not entry.get(field)]
+    try:
+        if missing:
+            raise Exception(f"missing {', '.join(missing)}")
+        if undo:
+            undo_host(entry['host'], entry['ssh_username'], entry['ssh_password'], entry['ip_address'])
+        else:
+            configure_host(entry['host'], entry['ssh_username'], entry['ssh_password'], entry['radio_ip'],
+                           entry['radio_username'], entry['radio_password'], entry['ip_address'])
     except Exception as e:
-        messagebox.showerror("Error", str(e))
-
-def undo_configuration():
-    confirm = messagebox.askyesno(
-        "Confirm Undo",
-        "Are you sure you want to undo the configuration?\nThis will remove the credentials and network address from the CORE I/O."
-    )
-    if not confirm:
-        return
-    host = entry_host.get()
-    ssh_username = entry_ssh_username.get()
-    ssh_password = entry_ssh_password.get()
-    ip_address = entry_ip.get()
-    credentials_path = "/persist/opt/doodle_rpc_credentials"
-    nmcli_remove_cmd = f"nmcli con mod eth-robot -ipv4.addresses {ip_address}/16"
-    nmcli_up_cmd = "nmcli con up eth-robot"
-
-    if not all([host, ssh_username, ssh_password, ip_address]):
-        messagebox.showerror("Error", "Please fill in all fields (except radio credentials) to undo configuration.")
-        return
+        return HostResult(entry['host'], False, str(e), time.monotonic() - started)
+    return HostResult(entry['host'], True, "undone" if undo else "configured", time.monotonic() - started)
+
 
+def provision_fleet(inventory: List[Dict[str, str]], undo: bool = False,
+                    max_parallel: int = MAX_PARALLEL) -> List[HostResult]:
+    """Configure (or undo) every CORE I/O in the inventory concurrently, reporting each as it finishes."""
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        futures = [executor.submit(_provision, entry, undo) for entry in inventory]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "ok" if result.ok else "FAILED"
+            print(f"{result.host:<20} {status:<7} {result.seconds:6.1f}s  {result.message}", flush=True)
+    return results
+
+
+def run_batch(options) -> int:
+    defaults = {
+        'ssh_username': options.ssh_username,
+        'ssh_password': os.environ.get(SSH_PASSWORD_ENV),
+        'radio_ip': options.radio_ip,
+        'radio_username': options.radio_username,
+        'radio_password': os.environ.get(RADIO_PASSWORD_ENV),
+    }
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=ssh_username, password=ssh_password)
-
-        # Delete credentials file
-        del_cmd = f"sudo -S rm -f {credentials_path}"
-        stdin, stdout, stderr = ssh.exec_command(del_cmd, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        stdout.channel.recv_exit_status()
-        del_err = stderr.read().decode()
-        if del_err:
-            raise Exception(f"Error deleting credentials file: {del_err}")
-
-        # Remove IP address from eth-robot
-        nmcli_remove_full = f"sudo -S {nmcli_remove_cmd}"
-        stdin, stdout, stderr = ssh.exec_command(nmcli_remove_full, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        remove_out = stdout.read().decode()
-        remove_err = stderr.read().decode()
-        if remove_err:
-            raise Exception(f"nmcli remove error: {remove_err}")
-        
-        # Run nmcli up command
-        nmcli_up_full = f"sudo -S {nmcli_up_cmd}"
-        stdin, stdout, stderr = ssh.exec_command(nmcli_up_full, get_pty=True)
-        stdin.write(f'{ssh_password}\n')
-        stdin.flush()
-        up_out = stdout.read().decode()
-        up_err = stderr.read().decode()
-        if up_err:
-            raise Exception(f"nmcli up error: {up_err}")
+        inventory = load_inventory(options.inventory, defaults)
+    except (OSError, ValueError) as e:
+        print(f"Could not read inventory: {str(e)}", file=sys.stderr)
+        return 2
 
-        ssh.close()
-        messagebox.showinfo("Undo Success", f"Configuration undone!\n\nMake sure to restart the doodle_battery_service extension from CORE I/O's webpage.")
-    except Exception as e:
-        messagebox.showerror("Error", str(e))
-
-# GUI setup
-root = tk.Tk()
-root.title("CORE I/O Doodle Config Tool")
-root.geometry("400x400")
-root.resizable(False, False)
-
-# --- CORE I/O Connection Frame ---
-frame_coreio = tk.LabelFrame(root, text="CORE I/O Connection", padx=10, pady=10)
-frame_coreio.pack(fill='x', padx=10, pady=(10, 5))
-
-label_host = tk.Label(frame_coreio, text="CORE I/O IP Address:", width=22, anchor='w')
-label_host.grid(row=0, column=0, sticky='w')
-entry_host = tk.Entry(frame_coreio, width=28)
-entry_host.grid(row=0, column=1, pady=2)
-
-label_ssh_username = tk.Label(frame_coreio, text="CORE I/O Username:", width=22, anchor='w')
-label_ssh_username.grid(row=1, column=0, sticky='w')
-entry_ssh_username = tk.Entry(frame_coreio, width=28)
-entry_ssh_username.grid(row=1, column=1, pady=2)
-
-label_ssh_password = tk.Label(frame_coreio, text="CORE I/O Password:", width=22, anchor='w')
-label_ssh_password.grid(row=2, column=0, sticky='w')
-entry_ssh_password = tk.Entry(frame_coreio, width=28, show='*')
-entry_ssh_password.grid(row=2, column=1, pady=2)
-
-# --- Doodle Radio Frame ---
-frame_radio = tk.LabelFrame(root, text="Doodle Radio", padx=10, pady=10)
-frame_radio.pack(fill='x', padx=10, pady=5)
-
-label_radio_ip = tk.Label(frame_radio, text="Doodle Radio IP on Spot:", width=22, anchor='w')
-label_radio_ip.grid(row=0, column=0, sticky='w')
-entry_radio_ip = tk.Entry(frame_radio, width=28)
-entry_radio_ip.grid(row=0, column=1, pady=2)
-
-label_radio_username = tk.Label(frame_radio, text="Doodle RPC Username:", width=22, anchor='w')
-label_radio_username.grid(row=1, column=0, sticky='w')
-entry_radio_username = tk.Entry(frame_radio, width=28)
-entry_radio_username.grid(row=1, column=1, pady=2)
-
-label_radio_password = tk.Label(frame_radio, text="Doodle RPC Password:", width=22, anchor='w')
-label_radio_password.grid(row=2, column=0, sticky='w')
-entry_radio_password = tk.Entry(frame_radio, width=28, show='*')
-entry_radio_password.grid(row=2, column=1, pady=2)
-
-# --- Network Frame ---
-frame_network = tk.LabelFrame(root, text="Network", padx=10, pady=10)
-frame_network.pack(fill='x', padx=10, pady=5)
-
-label_ip = tk.Label(frame_network, text="IP for CORE I/O (10.223.X.Y):", width=22, anchor='w')
-label_ip.grid(row=0, column=0, sticky='w')
-entry_ip = tk.Entry(frame_network, width=28)
-entry_ip.grid(row=0, column=1, pady=2)
-
-# --- Buttons Frame ---
-frame_buttons = tk.Frame(root)
-frame_buttons.pack(pady=15)
-
-configure_btn = tk.Button(frame_buttons, text="Configure", command=configure_radio, bg='#4CAF50', fg='white', width=18, height=2)
-configure_btn.pack(side='left', padx=10)
-
-undo_btn = tk.Button(frame_buttons, text="Undo Configuration", command=undo_configuration, bg='#f44336', fg='white', width=18, height=2)
-undo_btn.pack(side='left', padx=10)
-
-root.mainloop() 
\ No newline at end of file
+    started = time.monotonic()
+    results = provision_fleet(inventory, undo=options.undo, max_parallel=options.parallel)
+    failed = [result for result in results if not result.ok]
+    print(f"{len(results) - len(failed)}/{len(results)} CORE I/Os {'undone' if options.undo else 'configured'} "
+          f"in {time.monotonic() - started:.1f}s. {RESTART_REMINDER}")
+
+    if options.report:
+        with open(options.report, 'w') as report_file:
+            json.dump([result._asdict() for result in results], report_file, indent=2)
+    return 1 if failed else 0
+
+
+def run_gui() -> None:
+    import tkinter as tk
+    from tkinter import messagebox
+
+    def configure_radio():
+        host = entry_host.get()
+        ssh_username = entry_ssh_username.get()
+        ssh_password = entry_ssh_password.get()
+
+        radio_ip_address = entry_radio_ip.get()
+        radio_rpc_username = entry_radio_username.get()
+        radio_rpc_password = entry_radio_password.get()
+
+        ip_address = entry_ip.get()
+
+        if not all([host, ssh_username, ssh_password, radio_rpc_username, radio_rpc_password, radio_ip_address, ip_address]):
+            messagebox.showerror("Error", "Please fill in all fields.")
+            return
+
+        try:
+            configure_host(host, ssh_username, ssh_password, radio_ip_address, radio_rpc_username,
+                           radio_rpc_password, ip_address)
+            messagebox.showinfo("Success", f"Configuration complete!\n\n{RESTART_REMINDER}")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def undo_configuration():
+        confirm = messagebox.askyesno(
+            "Confirm Undo",
+            "Are you sure you want to undo the configuration?\nThis will remove the credentials and network address from the CORE I/O."
+        )
+        if not confirm:
+            return
+        host = entry_host.get()
+        ssh_username = entry_ssh_username.get()
+        ssh_password = entry_ssh_password.get()
+        ip_address = entry_ip.get()
+
+        if not all([host, ssh_username, ssh_password, ip_address]):
+            messagebox.showerror("Error", "Please fill in all fields (except radio credentials) to undo configuration.")
+            return
+
+        try:
+            undo_host(host, ssh_username, ssh_password, ip_address)
+            messagebox.showinfo("Undo Success", f"Configuration undone!\n\n{RESTART_REMINDER}")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    # GUI setup
+    root = tk.Tk()
+    root.title("CORE I/O Doodle Config Tool")
+    root.geometry("400x400")
+    root.resizable(False, False)
+
+    # --- CORE I/O Connection Frame ---
+    frame_coreio = tk.LabelFrame(root, text="CORE I/O Connection", padx=10, pady=10)
+    frame_coreio.pack(fill='x', padx=10, pady=(10, 5))
+
+    label_host = tk.Label(frame_coreio, text="CORE I/O IP Address:", width=22, anchor='w')
+    label_host.grid(row=0, column=0, sticky='w')
+    entry_host = tk.Entry(frame_coreio, width=28)
+    entry_host.grid(row=0, column=1, pady=2)
+
+    label_ssh_username = tk.Label(frame_coreio, text="CORE I/O Username:", width=22, anchor='w')
+    label_ssh_username.grid(row=1, column=0, sticky='w')
+    entry_ssh_username = tk.Entry(frame_coreio, width=28)
+    entry_ssh_username.grid(row=1, column=1, pady=2)
+
+    label_ssh_password = tk.Label(frame_coreio, text="CORE I/O Password:", width=22, anchor='w')
+    label_ssh_password.grid(row=2, column=0, sticky='w')
+    entry_ssh_password = tk.Entry(frame_coreio, width=28, show='*')
+    entry_ssh_password.grid(row=2, column=1, pady=2)
+
+    # --- Doodle Radio Frame ---
+    frame_radio = tk.LabelFrame(root, text="Doodle Radio", padx=10, pady=10)
+    frame_radio.pack(fill='x', padx=10, pady=5)
+
+    label_radio_ip = tk.Label(frame_radio, text="Doodle Radio IP on Spot:", width=22, anchor='w')
+    label_radio_ip.grid(row=0, column=0, sticky='w')
+    entry_radio_ip = tk.Entry(frame_radio, width=28)
+    entry_radio_ip.grid(row=0, column=1, pady=2)
+
+    label_radio_username = tk.Label(frame_radio, text="Doodle RPC Username:", width=22, anchor='w')
+    label_radio_username.grid(row=1, column=0, sticky='w')
+    entry_radio_username = tk.Entry(frame_radio, width=28)
+    entry_radio_username.grid(row=1, column=1, pady=2)
+
+    label_radio_password = tk.Label(frame_radio, text="Doodle RPC Password:", width=22, anchor='w')
+    label_radio_password.grid(row=2, column=0, sticky='w')
+    entry_radio_password = tk.Entry(frame_radio, width=28, show='*')
+    entry_radio_password.grid(row=2, column=1, pady=2)
+
+    # --- Network Frame ---
+    frame_network = tk.LabelFrame(root, text="Network", padx=10, pady=10)
+    frame_network.pack(fill='x', padx=10, pady=5)
+
+    label_ip = tk.Label(frame_network, text="IP for CORE I/O (10.223.X.Y):", width=22, anchor='w')
+    label_ip.grid(row=0, column=0, sticky='w')
+    entry_ip = tk.Entry(frame_network, width=28)
+    entry_ip.grid(row=0, column=1, pady=2)
+
+    # --- Buttons Frame ---
+    frame_buttons = tk.Frame(root)
+    frame_buttons.pack(pady=15)
+
+    configure_btn = tk.Button(frame_buttons, text="Configure", command=configure_radio, bg='#4CAF50', fg='white', width=18, height=2)
+    configure_btn.pack(side='left', padx=10)
+
+    undo_btn = tk.Button(frame_buttons, text="Undo Configuration", command=undo_configuration, bg='#f44336', fg='white', width=18, height=2)
+    undo_btn.pack(side='left', padx=10)
+
+    root.mainloop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Configure CORE I/Os for doodle_battery_service. Without --inventory the GUI opens.",
+        epilog=f"Inventory columns: {', '.join(INVENTORY_FIELDS)}. Blank columns fall back to the options below; "
+               f"passwords fall back to ${SSH_PASSWORD_ENV} and ${RADIO_PASSWORD_ENV}.")
+    parser.add_argument('--inventory', default=None, help='CSV file listing the CORE I/Os to configure.')
+    parser.add_argument('--undo', action='store_true', help='Remove the configuration instead of applying it.')
+    parser.add_argument('--parallel', type=int, default=MAX_PARALLEL, help='CORE I/Os configured at once.')
+    parser.add_argument('--report', default=None, help='Write the per-host results to this JSON file.')
+    parser.add_argument('--ssh-username', default=None, help='CORE I/O username for rows that leave it blank.')
+    parser.add_argument('--radio-ip', default=None, help='Doodle radio IP on Spot for rows that leave it blank.')
+    parser.add_argument('--radio-username', default=None, help='Doodle RPC username for rows that leave it blank.')
+    options = parser.parse_args()
+
+    if options.inventory is not None and options.report is None and sys.stdout is None:
+        # The windowed build has no console to print to, so its results always go to a file
+        options.report = f"{os.path.splitext(options.inventory)[0]}{REPORT_SUFFIX}"
+
+    if options.inventory is None:
+        run_gui()
+        return 0
+    return run_batch(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
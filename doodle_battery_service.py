@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 import time
 
 from bosdyn.api import data_acquisition_pb2, data_acquisition_plugin_service_pb2_grpc
@@ -14,26 +15,78 @@ from bosdyn.client.server_util import GrpcServiceRunner
 from bosdyn.client.signals_helpers import build_capability_live_data, build_live_data_response
 
 from doodle_helper import DoodleHelper
-from build_signal import build_signals
+from async_doodle_helper import MAX_CONCURRENCY
+from process_poller import ProcessStationPoller
+from station_poller import (DEFAULT_MAX_SNAPSHOT_AGE, DEFAULT_POLL_BACKEND, DEFAULT_POLL_INTERVAL, POLL_BACKENDS,
+                            StationPoller)
+from startup_timer import StartupTimer
+from metrics import LIVE_DATA_SECONDS, METRICS, METRICS_HOST, MetricsServer
+from build_signal import SignalCache
+from ubus_trace import RecordingReachability, RecordingTransport, TraceRecorder
 import bosdyn.client.exceptions as bd_exceptions
 
 DIRECTORY_NAME = 'data-acquisition-doodle-battery'
 AUTHORITY = 'data-acquisition-doodle-battery'
 CAPABILITY = Capability(name='doodle-battery', description='Doodle Battery Level', channel_name='doodle-battery', has_live_data=True)
+FLEET_CAPABILITY = Capability(name='doodle-battery-fleet', description='Doodle Mesh Battery Snapshot', channel_name='doodle-battery-fleet')
+
+DEFAULT_MAX_CAPTURE_AGE = 5.0  # seconds a polled local reading may be reused for a data capture
 
 _LOGGER = logging.getLogger('doodle_battery_service')
 
 class DoodleBatteryAdapter:
-    def __init__(self, host_ip, username, password):
+    def __init__(self, host_ip, username, password, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_snapshot_age=DEFAULT_MAX_SNAPSHOT_AGE, poll_backend=DEFAULT_POLL_BACKEND,
+                 max_concurrency=MAX_CONCURRENCY, topology_cache_path=None, startup_timer=None,
+                 max_capture_age=DEFAULT_MAX_CAPTURE_AGE, transport=None, reachability=None, poll_process=False):
         self.host_ip = host_ip
         self.username = username
         self.password = password
-        self.doodle_helper = DoodleHelper(host_ip, username, password, _LOGGER)
-        self.doodle_helper.login()
+        self.max_capture_age = max_capture_age
+        # Radio login and topology warm-up happen on the poller thread, so construction never blocks on the radio
+        session_registry = None
+        if poll_process:
+            # Polling gets its own process and GIL; this one only reads its snapshots and serves gRPC
+            self.poller = ProcessStationPoller(host_ip, username, password, _LOGGER, poll_interval=poll_interval,
+                                               max_snapshot_age=max_snapshot_age, backend=poll_backend,
+                                               max_concurrency=max_concurrency,
+                                               topology_cache_path=topology_cache_path)
+        else:
+            root_station = DoodleHelper(host_ip, username, password, _LOGGER, transport=transport)
+            self.poller = StationPoller(root_station, _LOGGER, poll_interval=poll_interval,
+                                        max_snapshot_age=max_snapshot_age, backend=poll_backend,
+                                        max_concurrency=max_concurrency, topology_cache_path=topology_cache_path,
+                                        startup_timer=startup_timer, transport=transport, reachability=reachability)
+            session_registry = root_station.session_registry
+        # Live reads run on gRPC threads, so they get their own helper and never race the poller's login state;
+        # it logs in through the poller's session registry, so it takes over the poller's token when there is one
+        self.doodle_helper = DoodleHelper(host_ip, username, password, _LOGGER, session_registry=session_registry,
+                                          transport=transport)
+        self.signal_cache = SignalCache()
+        self._live_data_lock = threading.Lock()
+        self._live_data_key = None
+        self._live_data_response = None
+        self.poller.start()
     
+    def _read_local_station(self):
+        """Return (reading, source), preferring a polled reading no older than max_capture_age."""
+        local_station = self.poller.get_snapshot().local_station
+        if local_station is not None and time.time() - local_station['timestamp'] <= self.max_capture_age:
+            return local_station, 'cached'
+
+        telemetry = None
+        if self.doodle_helper.token is not None or self.doodle_helper.login():
+            telemetry = self.doodle_helper.get_telemetry()
+        if telemetry is not None and telemetry.voltage is not None:
+            return self.poller.build_local_reading(telemetry), 'live'
+        # Better an older reading, clearly labelled, than a None when the radio hiccups
+        if local_station is not None:
+            return local_station, 'cached'
+        return None, 'live'
+
     def get_battery_data(self, request, store_helper):
         data_id = data_acquisition_pb2.DataIdentifier(action_id=request.action_id, channel=CAPABILITY.channel_name)
-        data = self.doodle_helper.get_battery_voltage()
+        reading, source = self._read_local_station()
         
         store_helper.cancel_check()
         store_helper.state.set_status(data_acquisition_pb2.GetStatusResponse.STATUS_SAVING)
@@ -41,29 +94,100 @@ class DoodleBatteryAdapter:
         message = data_acquisition_pb2.AssociatedMetadata()
         message.reference_id.action_id.CopyFrom(request.action_id)
         message.metadata.data.update({
-            "battery_voltage": data
+            "battery_voltage": reading['voltage'] if reading is not None else None,
+            "input_current": reading['input_current'] if reading is not None else None,
+            "temperature": reading['temperature'] if reading is not None else None,
+            "pancake": dict(reading['telemetry']) if reading is not None and reading['telemetry'] else None,
+            "reading_timestamp": reading['timestamp'] if reading is not None else time.time(),
+            "reading_source": source
         })
         _LOGGER.info(f"Retrieving battery data : {message.metadata.data}")
 
         store_helper.store_metadata(message, data_id)
+
+    def _build_fleet_columns(self, snapshot):
+        """Lay out every radio in the snapshot as parallel columns, the local radio first."""
+        now = time.time()
+        station_depth = self.poller.hop_depths()
+        stations = list(snapshot.stations)
+        if snapshot.local_station is not None:
+            stations.insert(0, snapshot.local_station)
+
+        columns = {name: [] for name in ('mac_address', 'ip_address', 'voltage', 'battery_percentage',
+                                         'input_current', 'temperature', 'hop_depth', 'link_snr',
+                                         'path_throughput', 'reading_age')}
+        for station in stations:
+            mac_address = station['mac_address']
+            columns['mac_address'].append(mac_address or '')
+            columns['ip_address'].append(station['ip_address'])
+            columns['voltage'].append(station['voltage'])
+            columns['battery_percentage'].append(station['battery_percentage'])
+            columns['input_current'].append(station['input_current'])
+            columns['temperature'].append(station['temperature'])
+            columns['hop_depth'].append(0 if mac_address is None else station_depth.get(mac_address, -1))
+            columns['link_snr'].append(station['link_snr'])
+            columns['path_throughput'].append(station['path_throughput'])
+            columns['reading_age'].append(now - station['timestamp'])
+        return columns
+
+    def get_fleet_data(self, request, store_helper):
+        data_id = data_acquisition_pb2.DataIdentifier(action_id=request.action_id, channel=FLEET_CAPABILITY.channel_name)
+        # Built from the last published snapshot, so capture cost does not depend on radio round trips
+        snapshot = self.poller.get_snapshot()
+        columns = self._build_fleet_columns(snapshot)
+
+        store_helper.cancel_check()
+        store_helper.state.set_status(data_acquisition_pb2.GetStatusResponse.STATUS_SAVING)
+
+        message = data_acquisition_pb2.AssociatedMetadata()
+        message.reference_id.action_id.CopyFrom(request.action_id)
+        message.metadata.data.update({
+            "snapshot_timestamp": snapshot.timestamp,
+            "radio_count": len(columns['mac_address']),
+            "radios": columns
+        })
+        _LOGGER.info(f"Retrieving fleet battery data for {len(columns['mac_address'])} radios")
+
+        store_helper.store_metadata(message, data_id)
+
+    def get_data(self, request, store_helper):
+        """Run the capture of every capability named in the acquisition request."""
+        capture_names = {capture.name for capture in request.acquisition_requests.data_captures}
+        if CAPABILITY.name in capture_names:
+            self.get_battery_data(request, store_helper)
+        if FLEET_CAPABILITY.name in capture_names:
+            self.get_fleet_data(request, store_helper)
     
     def get_live_data(self, request):
-        # Get all reachable stations with fresh voltage readings except the local station
-        stations = [station for station in self.doodle_helper.get_all_reachable_stations() if station['ip_address'] != self.host_ip]
+        with METRICS.timer(LIVE_DATA_SECONDS):
+            return self._build_live_data()
 
-        # Build signals for all stations
-        signals = build_signals(stations)
+    def _build_live_data(self):
+        # Serve the latest poll snapshot; the local station is already excluded by the poller
+        snapshot = self.poller.get_fresh_snapshot()
+        readiness = self.poller.readiness
 
-        return build_live_data_response([build_capability_live_data(signals, CAPABILITY.name)])
+        # Rebuild only when the snapshot or readiness changed since the last request
+        with self._live_data_lock:
+            if self._live_data_key != (snapshot.version, readiness):
+                signals = self.signal_cache.build_signals(snapshot.stations)
+                signals['service_status'] = self.signal_cache.build_status_signal(readiness)
+                self._live_data_response = build_live_data_response([build_capability_live_data(signals, CAPABILITY.name)])
+                self._live_data_key = (snapshot.version, readiness)
+            cached_response = self._live_data_response
 
-def make_servicer(sdk_robot, host_ip, username, password):
-    adapter = DoodleBatteryAdapter(host_ip, username, password)
-    return DataAcquisitionPluginService(sdk_robot, [CAPABILITY], adapter.get_battery_data, live_response_fn=adapter.get_live_data, logger=_LOGGER)
+        # The plugin service fills in the response header in place, so every caller gets its own copy
+        response = data_acquisition_pb2.LiveDataResponse()
+        response.CopyFrom(cached_response)
+        return response
 
-def run_service(sdk_robot, host_ip, username, password, port):
+def make_servicer(sdk_robot, adapter):
+    return DataAcquisitionPluginService(sdk_robot, [CAPABILITY, FLEET_CAPABILITY], adapter.get_data, live_response_fn=adapter.get_live_data, logger=_LOGGER)
+
+def run_service(sdk_robot, adapter, port):
     add_servicer_to_server_fn = data_acquisition_plugin_service_pb2_grpc.add_DataAcquisitionPluginServiceServicer_to_server
 
-    return GrpcServiceRunner(make_servicer(sdk_robot,host_ip, username, password), add_servicer_to_server_fn, port, logger=_LOGGER)
+    return GrpcServiceRunner(make_servicer(sdk_robot, adapter), add_servicer_to_server_fn, port, logger=_LOGGER)
 
 def authenticate_with_backoff(robot, guid, secret, max_retries=5, base_interval=5.0):
     for attempt in range(max_retries):
@@ -82,14 +206,41 @@ if __name__ == '__main__':
     bosdyn.client.util.add_base_arguments(parser)
     bosdyn.client.util.add_payload_credentials_arguments(parser)
     bosdyn.client.util.add_service_endpoint_arguments(parser)
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Seconds between background radio poll cycles.')
+    parser.add_argument('--max-snapshot-age', type=float, default=DEFAULT_MAX_SNAPSHOT_AGE,
+                        help='Seconds after which polled readings are no longer served.')
+    parser.add_argument('--poll-backend', choices=POLL_BACKENDS, default=DEFAULT_POLL_BACKEND,
+                        help='Use a thread pool or a single asyncio loop to poll radios.')
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY,
+                        help='Maximum number of radios polled at once by the asyncio backend.')
+    parser.add_argument('--topology-cache', default=None,
+                        help='File used to persist the discovered radio topology across restarts.')
+    parser.add_argument('--max-capture-age', type=float, default=DEFAULT_MAX_CAPTURE_AGE,
+                        help='Seconds a polled reading may be reused for a data capture before reading the radio live.')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve latency histograms and per-radio counters over HTTP on this port.')
+    parser.add_argument('--metrics-host', default=METRICS_HOST,
+                        help='Address the metrics endpoint listens on.')
+    parser.add_argument('--record-trace', default=None,
+                        help='Record all ubus traffic of the thread-pool backend to this gzip trace file.')
+    parser.add_argument('--poll-process', action='store_true',
+                        help='Poll radios in a supervised worker process that shares its readings through shared memory.')
     options = parser.parse_args()
+    if options.poll_process and options.record_trace is not None:
+        parser.error('--record-trace records the in-process poller and cannot be combined with --poll-process')
+    if options.record_trace is not None and options.poll_backend == 'asyncio':
+        # The asyncio backend opens its own connections, so its traffic would be missing from the trace
+        parser.error('--record-trace records the thread-pool backend and cannot be combined with '
+                     '--poll-backend asyncio')
 
     setup_logging(options.verbose)
-    
-    sdk = bosdyn.client.create_standard_sdk("DoodleBatteryService")
-    robot = sdk.create_robot(options.hostname)
-    guid, secret = bosdyn.client.util.get_guid_and_secret(options)
-    authenticate_with_backoff(robot, guid, secret)
+    startup_timer = StartupTimer(_LOGGER)
+
+    if options.metrics_port is not None:
+        metrics_server = MetricsServer(options.metrics_port, host=options.metrics_host)
+        metrics_server.start()
+        _LOGGER.info(f"Serving metrics on http://{options.metrics_host}:{metrics_server.port}/metrics")
 
     # Read RPC credentials from file
     rpc_cred = open("/doodle_rpc_credentials", "r").read().splitlines()
@@ -97,11 +248,39 @@ if __name__ == '__main__':
     USERNAME = rpc_cred[1]
     PASSWORD = rpc_cred[2]
 
-    service_runner = run_service(robot, host_ip=HOST_IP, username=USERNAME, password=PASSWORD, port=options.port)
+    trace_recorder = transport = reachability = None
+    if options.record_trace is not None:
+        trace_recorder = TraceRecorder(options.record_trace)
+        transport = RecordingTransport(trace_recorder)
+        reachability = RecordingReachability(trace_recorder)
+        _LOGGER.info(f"Recording ubus traffic to {options.record_trace}")
+
+    # Start radio login and topology warm-up first so they overlap robot authentication
+    adapter = DoodleBatteryAdapter(HOST_IP, USERNAME, PASSWORD, poll_interval=options.poll_interval,
+                                   max_snapshot_age=options.max_snapshot_age, poll_backend=options.poll_backend,
+                                   max_concurrency=options.max_concurrency, topology_cache_path=options.topology_cache,
+                                   startup_timer=startup_timer, max_capture_age=options.max_capture_age,
+                                   transport=transport, reachability=reachability, poll_process=options.poll_process)
+    
+    sdk = bosdyn.client.create_standard_sdk("DoodleBatteryService")
+    robot = sdk.create_robot(options.hostname)
+    guid, secret = bosdyn.client.util.get_guid_and_secret(options)
+    with startup_timer.phase('robot authentication'):
+        authenticate_with_backoff(robot, guid, secret)
+
+    with startup_timer.phase('gRPC server'):
+        service_runner = run_service(robot, adapter, port=options.port)
 
-    dir_reg_client = robot.ensure_client(DirectoryRegistrationClient.default_service_name)
-    keep_alive = DirectoryRegistrationKeepAlive(dir_reg_client, logger=_LOGGER)
-    keep_alive.start(DIRECTORY_NAME, DataAcquisitionPluginService.service_type, AUTHORITY, options.host_ip, service_runner.port)
+    with startup_timer.phase('directory registration'):
+        dir_reg_client = robot.ensure_client(DirectoryRegistrationClient.default_service_name)
+        keep_alive = DirectoryRegistrationKeepAlive(dir_reg_client, logger=_LOGGER)
+        keep_alive.start(DIRECTORY_NAME, DataAcquisitionPluginService.service_type, AUTHORITY, options.host_ip, service_runner.port)
+    startup_timer.log_summary('Service registered')
 
-    with keep_alive:
-        service_runner.run_until_interrupt()
+    try:
+        with keep_alive:
+            service_runner.run_until_interrupt()
+    finally:
+        adapter.poller.close()
+        if trace_recorder is not None:
+            trace_recorder.close()
@@ -1,41 +1,282 @@
 import requests
-from requests.adapters import HTTPAdapter
 import json
+import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
-import socket
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
 
-from urllib3 import Retry
+from metrics import (DISCOVERY_SECONDS, LOGIN_SECONDS, METRICS, RADIO_FAILURES, RADIO_POLL_SECONDS, RADIO_TIMEOUTS,
+                     VOLTAGE_READ_SECONDS)
+from radio_registry import RadioRegistry
+from reachability import ReachabilitySweeper
+from transport import SHARED_TRANSPORT, UBUS_PORT, RadioTransport
 
 BATTERY_VOLTAGE_MAX = 8.2
 BATTERY_VOLTAGE_MIN = 6.6
-REQUEST_TIMEOUT = 2  # seconds
+REQUEST_TIMEOUT = 2  # seconds, also the ceiling of the adaptive per-radio timeout
+MIN_REQUEST_TIMEOUT = 0.5  # seconds; floor of the adaptive timeout, enough for a TLS handshake on a clean path
+HOP_TIMEOUT = 0.25  # seconds budgeted per hop of a radio's path until a round trip to it has been measured
+MARGINAL_LINK_SNR = 15.0  # dB; paths through a weaker link are budgeted twice the time per hop
 MAX_WORKERS = 10  # maximum number of concurrent requests
+DISCOVERY_DEADLINE = 30  # seconds allowed for a full mesh crawl
+MAX_MISSED_SIGHTINGS = 3  # topology refreshes a radio may go unseen before it is aged out
+MESH_SUBNET = "10.223"  # first two octets of the mesh addressing scheme, the last two come from the MAC
+VOLTAGE_DIVIDER = 20.2  # pancake.txt reports VIN VOLTAGE scaled by this factor
+ANONYMOUS_SESSION = "00000000000000000000000000000000"
+DEFAULT_SESSION_TIMEOUT = 300  # seconds, rpcd default when login does not report "expires"
+SESSION_EXPIRY_MARGIN = 10  # seconds, refresh tokens this long before rpcd would expire them
+UBUS_STATUS_PERMISSION_DENIED = 6  # ubus status of a call the session's ACL refuses
+JSONRPC_ACCESS_DENIED = -32002
+TOPOLOGY_CACHE_VERSION = 2  # bump when the layout written by save_topology changes
+PANCAKE_PATH = "/tmp/run/pancake.txt"
+# Keys of the Pancake board fields published as their own signals
+PANCAKE_VOLTAGE_KEY = "VIN VOLTAGE"
+PANCAKE_CURRENT_KEY = "VIN CURRENT"
+PANCAKE_TEMPERATURE_KEY = "TEMPERATURE"
+# (ubus object, method, arguments) of the calls made against every radio
+ASSOCLIST_CALL = ("iwinfo", "assoclist", {"device": "wlan0"})
+PANCAKE_READ_CALL = ("file", "read", {"path": PANCAKE_PATH})
+PANCAKE_CALL = ("file", "exec", {"command": "cat", "params": [PANCAKE_PATH]})  # for radios whose ACL denies file read
+
+# Radios use self-signed certificates; silence the warning once rather than per helper
+requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+
+class PancakeTelemetry(NamedTuple):
+    """Everything the Pancake board reported in one read of pancake.txt."""
+    voltage: Optional[float]  # battery volts, already divided by VOLTAGE_DIVIDER
+    input_current: Optional[float]
+    temperature: Optional[float]
+    fields: Mapping[str, object]  # every field of pancake.txt as reported
+
+def _optional_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_pancake(pancake_output: str) -> PancakeTelemetry:
+    """Parse the contents of pancake.txt into a telemetry record."""
+    json_data = json.loads(pancake_output.strip())
+    voltage = _optional_float(json_data.get(PANCAKE_VOLTAGE_KEY))
+    return PancakeTelemetry(
+        voltage / VOLTAGE_DIVIDER if voltage is not None else None,
+        _optional_float(json_data.get(PANCAKE_CURRENT_KEY)),
+        _optional_float(json_data.get(PANCAKE_TEMPERATURE_KEY)),
+        json_data
+    )
+
+def pancake_contents(result: Dict) -> str:
+    """Return the file contents from either a file read or a file exec result."""
+    return result['data'] if 'data' in result else result.get('stdout', '')
+
+class LinkQuality(NamedTuple):
+    """Quality of one mesh link, as reported in the association list of the radio at one end."""
+    signal: Optional[float]  # dBm
+    noise: Optional[float]  # dBm
+    expected_throughput: Optional[float]  # Mbit/s
+
+    @property
+    def snr(self) -> Optional[float]:
+        if self.signal is None or self.noise is None:
+            return None
+        return self.signal - self.noise
+
+def parse_link_quality(station: Dict) -> LinkQuality:
+    """Extract the link quality of one iwinfo assoclist entry."""
+    throughput = _optional_float(station.get('expected_throughput'))  # kbit/s
+    if not throughput:
+        # Drivers without airtime estimates only report PHY rates; the slower direction bounds the link
+        rates = [_optional_float((station.get(direction) or {}).get('rate')) for direction in ('rx', 'tx')]
+        rates = [rate for rate in rates if rate]
+        throughput = min(rates) if rates else None
+    return LinkQuality(_optional_float(station.get('signal')), _optional_float(station.get('noise')),
+                       throughput / 1000.0 if throughput else None)
+
+def _link_width(quality: LinkQuality) -> float:
+    return quality.expected_throughput or 0.0
+
+class StationPath(NamedTuple):
+    """Best path from the root radio to a station: the one whose slowest link is fastest."""
+    parent: Optional[str]  # mac of the previous radio on the path, None when linked to the root
+    hops: int
+    link_snr: Optional[float]  # dB, link between the station and its parent
+    bottleneck_snr: Optional[float]  # dB, weakest link on the path
+    throughput: Optional[float]  # Mbit/s expected through the slowest link on the path
+
+def path_timeout(hops: int, bottleneck_snr: Optional[float] = None) -> float:
+    """Request timeout for a radio no round trip has been measured to yet."""
+    marginal = bottleneck_snr is not None and bottleneck_snr < MARGINAL_LINK_SNR
+    return min(REQUEST_TIMEOUT, MIN_REQUEST_TIMEOUT + HOP_TIMEOUT * hops * (2 if marginal else 1))
+
+class AdaptiveTimeout:
+    """Per-radio request timeout following the measured round-trip time, as TCP does (RFC 6298).
+
+    Until the first round trip it uses the timeout seeded from the radio's
+    path. Each consecutive timeout doubles it, up to REQUEST_TIMEOUT, so a
+    radio that is only slower than expected gets answered on a later poll.
+    """
+
+    __slots__ = ('_base', '_backoff', '_srtt', '_rttvar')
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT):
+        self._base = timeout
+        self._backoff = 0  # consecutive timeouts
+        self._srtt: Optional[float] = None
+        self._rttvar = 0.0
+
+    @property
+    def timeout(self) -> float:
+        return min(REQUEST_TIMEOUT, self._base * 2 ** self._backoff)
+
+    def seed(self, timeout: float) -> None:
+        """Use timeout as the base until a round trip has been measured."""
+        if self._srtt is None:
+            self._base = timeout
+
+    def observe(self, rtt: float) -> None:
+        if self._srtt is None:
+            self._srtt, self._rttvar = rtt, rtt / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - rtt)
+            self._srtt = 0.875 * self._srtt + 0.125 * rtt
+        self._base = max(MIN_REQUEST_TIMEOUT, self._srtt + 4 * self._rttvar)
+        self._backoff = 0
+
+    def expired(self) -> None:
+        self._backoff = min(self._backoff + 1, 8)
+
+def build_call_payload(token: str, ubus_object: str, method: str, arguments: Dict, request_id: int = 1) -> Dict:
+    """Build a JSON-RPC payload for an authenticated ubus call."""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "call",
+        "params": [token, ubus_object, method, arguments]
+    }
+
+def call_result(data: Optional[Dict]) -> Optional[Dict]:
+    """Extract the data returned by a ubus call from its JSON-RPC response."""
+    if data and 'result' in data and len(data['result']) > 1 and data['result'][1]:
+        return data['result'][1]
+    return None
+
+def is_access_denied(data: Dict) -> bool:
+    """Check if ubus rejected a call because the session is unknown or expired.
+
+    A call that the session's ACL refuses, such as a file read outside the
+    allowed paths, returns UBUS_STATUS_PERMISSION_DENIED instead. The session
+    is still valid then, so that is not a reason to log in again.
+    """
+    error = data.get("error")
+    return bool(error) and error.get("code") == JSONRPC_ACCESS_DENIED
+
+class UbusSessionRegistry:
+    """Thread-safe cache of ubus_rpc_session tokens keyed by radio IP.
+
+    rpcd extends a session's lifetime every time it is used, so each successful
+    call pushes the local expiry forward by the session timeout reported at login.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[str, float, float]] = {}  # {ip_address: (token, timeout, expires_at)}
+        self._file_read_denied: Set[str] = set()  # radios whose session ACL only allows reading pancake.txt via exec
+        self._lock = threading.Lock()
+
+    def get(self, host_ip: str) -> Optional[str]:
+        """Return the cached token for a radio, or None if there is none or it is about to expire."""
+        with self._lock:
+            entry = self._sessions.get(host_ip)
+            if entry is None:
+                return None
+            token, _, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._sessions[host_ip]
+                return None
+            return token
+
+    def store(self, host_ip: str, token: str, timeout: float) -> None:
+        """Cache a freshly issued token with the session timeout rpcd reported."""
+        with self._lock:
+            self._sessions[host_ip] = (token, timeout, time.monotonic() + timeout - SESSION_EXPIRY_MARGIN)
+
+    def touch(self, host_ip: str, token: str) -> None:
+        """Record that a token was just used successfully."""
+        with self._lock:
+            entry = self._sessions.get(host_ip)
+            if entry is not None and entry[0] == token:
+                self._sessions[host_ip] = (token, entry[1], time.monotonic() + entry[1] - SESSION_EXPIRY_MARGIN)
+
+    def invalidate(self, host_ip: str, token: Optional[str] = None) -> None:
+        """Forget a radio's token, only if it still matches the given one when provided."""
+        with self._lock:
+            entry = self._sessions.get(host_ip)
+            if entry is not None and (token is None or entry[0] == token):
+                del self._sessions[host_ip]
+
+    def deny_file_read(self, host_ip: str) -> None:
+        """Remember that a radio's ACL does not allow ubus file read."""
+        with self._lock:
+            self._file_read_denied.add(host_ip)
+
+    def allows_file_read(self, host_ip: str) -> bool:
+        with self._lock:
+            return host_ip not in self._file_read_denied
 
 class StationDiscovery:
-    def __init__(self, logger, cache_ttl_minutes: int = 1):
+    def __init__(self, logger, cache_ttl_minutes: int = 1, session_registry: Optional[UbusSessionRegistry] = None,
+                 discovery_deadline: float = DISCOVERY_DEADLINE, max_workers: int = MAX_WORKERS,
+                 mesh_subnet: str = MESH_SUBNET, port: int = UBUS_PORT, transport: Optional[RadioTransport] = None,
+                 reachability: Optional[ReachabilitySweeper] = None, crawl_timeout: Optional[float] = REQUEST_TIMEOUT):
         self.logger = logger
+        self.discovery_deadline = discovery_deadline
+        # Request timeout of radios the crawl reaches before their path is known; None budgets HOP_TIMEOUT per hop
+        self.crawl_timeout = crawl_timeout
+        self.max_workers = max_workers
+        self.mesh_subnet = mesh_subnet
+        self.port = port
+        self.session_registry = session_registry if session_registry is not None else UbusSessionRegistry()
+        self.transport = transport  # passed to every radio's helper, None for the shared transport
+        self.reachability = reachability if reachability is not None else ReachabilitySweeper(port=port)
+        self.radios = RadioRegistry()  # one long-lived helper and latest reading per radio
         self.cache_ttl = timedelta(minutes=cache_ttl_minutes)
         self.discovered_stations: Dict[str, str] = {}  # {mac_address: ip_address}
+        self.station_depth: Dict[str, int] = {}  # {mac_address: hops from the root radio}
+        self.station_parent: Dict[str, Optional[str]] = {}  # {mac_address: mac it was discovered through, None for the root}
         self.last_discovery: Optional[datetime] = None
         self.failed_login_attempts: Dict[str, int] = {}  # Track failed login attempts per station
+        self.discovery_readings: Dict[str, Dict] = {}  # {mac_address: reading} collected during the last crawl
+        self.root_neighbors: FrozenSet[str] = frozenset()  # macs in the root radio's latest association list
+        self.station_neighbors: Dict[str, FrozenSet[str]] = {}  # {mac_address: macs in its latest association list}
+        self.station_links: Dict[Optional[str], Dict[str, LinkQuality]] = {}  # {observer mac, None for the root: {neighbour mac: quality}}
+        self.station_paths: Dict[str, StationPath] = {}  # {mac_address: best path from the root}
+        self.station_last_seen: Dict[str, float] = {}  # {mac_address: time it last answered a query}
+        self.missed_sightings: Dict[str, int] = {}  # {mac_address: consecutive refreshes it went unseen}
+        self.reading_callback: Optional[Callable[[Dict], None]] = None  # called on the calling thread with each reading as it arrives
     
     def _estimate_percentage(self, voltage: float) -> float:
         return max(0, min(100, ((voltage - BATTERY_VOLTAGE_MIN) / (BATTERY_VOLTAGE_MAX - BATTERY_VOLTAGE_MIN)) * 100.0))
     
     def _mac_to_ip(self, mac_address: str) -> str:
         """Convert MAC address to IP address using the network scheme."""
-        return f"10.223.{int(mac_address.split(':')[4], 16)}.{int(mac_address.split(':')[5], 16)}"
+        return f"{self.mesh_subnet}.{int(mac_address.split(':')[4], 16)}.{int(mac_address.split(':')[5], 16)}"
     
     def remove_station(self, mac_address: str) -> None:
         """Remove a station from the cache and reset its failed login attempts."""
         if mac_address in self.discovered_stations:
             self.logger.warning(f"Removing unreachable radio {mac_address} from cache")
             del self.discovered_stations[mac_address]
-        if mac_address in self.failed_login_attempts:
-            del self.failed_login_attempts[mac_address]
+        self.radios.discard(mac_address)
+        for station_state in (self.failed_login_attempts, self.station_depth, self.station_parent,
+                              self.station_neighbors, self.station_links, self.station_paths,
+                              self.station_last_seen, self.missed_sightings):
+            station_state.pop(mac_address, None)
     
     def should_update_cache(self) -> bool:
         """Check if the station topology cache needs to be updated based on TTL."""
@@ -43,25 +284,62 @@ class StationDiscovery:
             return True
         return datetime.now() - self.last_discovery > self.cache_ttl
     
+    def _build_reading(self, mac_address: str, ip_address: str, voltage: float,
+                       telemetry: Optional[PancakeTelemetry] = None) -> Dict:
+        """Build the reading record published for a single station."""
+        path = self.station_paths.get(mac_address) if mac_address is not None else None
+        return {
+            'mac_address': mac_address,
+            'ip_address': ip_address,
+            'voltage': voltage,
+            'battery_percentage': self._estimate_percentage(voltage),
+            'input_current': telemetry.input_current if telemetry is not None else None,
+            'temperature': telemetry.temperature if telemetry is not None else None,
+            'telemetry': telemetry.fields if telemetry is not None else None,
+            'link_snr': path.link_snr if path is not None else None,
+            'path_throughput': path.throughput if path is not None else None,
+            'timestamp': time.time()
+        }
+
+    def _record_sighting(self, mac_address: str, assoc_list: Optional[List[Dict]]) -> None:
+        """Record that a station answered, along with its association list when one was read."""
+        self.station_last_seen[mac_address] = time.time()
+        if assoc_list is not None:
+            self.station_neighbors[mac_address] = frozenset(station['mac'] for station in assoc_list)
+            self.station_links[mac_address] = {station['mac']: parse_link_quality(station) for station in assoc_list}
+
+    def _record_login_failure(self, mac_address: str) -> None:
+        """Count a failed login; failing radios are backed off by the poll scheduler, not dropped."""
+        self.failed_login_attempts[mac_address] = self.failed_login_attempts.get(mac_address, 0) + 1
+
     def _is_radio_responsive(self, ip_address: str) -> bool:
-        """Check if a radio is responsive by attempting a TCP connection."""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)  # 2 second timeout for connection
-            result = sock.connect_ex((ip_address, 443))  # HTTPS port
-            sock.close()
-            return result == 0
-        except Exception:
-            return False
+        """Check if a radio is responsive, reusing this cycle's sweep result when there is one."""
+        return self.reachability.is_responsive(ip_address)
+
+    def _station_helper(self, mac_address: str, ip_address: str, username: str, password: str,
+                        hops: Optional[int] = None) -> 'DoodleHelper':
+        """Return the radio's long-lived helper, so polls reuse it instead of building one per radio per cycle."""
+        station_helper = self.radios.helper_for(
+            mac_address, ip_address,
+            lambda ip: DoodleHelper(ip, username, password, self.logger, session_registry=self.session_registry,
+                                    port=self.port, transport=self.transport))
+        path = self.station_paths.get(mac_address)
+        if path is not None:
+            station_helper.request_timeout.seed(path_timeout(path.hops, path.bottleneck_snr))
+        elif hops is not None:
+            station_helper.request_timeout.seed(self.crawl_timeout if self.crawl_timeout is not None
+                                                else path_timeout(hops))
+        return station_helper
 
     def _process_station(self, station_info: Tuple[str, 'DoodleHelper']) -> Optional[Dict]:
         """Process a single station and return its voltage information."""
         mac_address, station_helper = station_info
         ip_address = station_helper.host_ip
+        started = time.perf_counter()
 
         # Quick check if radio is responsive
         if not self._is_radio_responsive(ip_address):
-            self.logger.debug(f"Radio at {ip_address} is not responsive, skipping")
+            self.logger.debug("Radio at %s is not responsive, skipping", ip_address)
             return None
 
         voltage = 0.0
@@ -69,81 +347,354 @@ class StationDiscovery:
             if station_helper.login():
                 # Reset failed attempts on successful login
                 self.failed_login_attempts[mac_address] = 0
-                voltage = station_helper.get_battery_voltage()
-                if voltage is not None:  # Only return result if we got a valid voltage
-                    return {
-                        'mac_address': mac_address,
-                        'ip_address': ip_address,
-                        'voltage': voltage,
-                        'battery_percentage': self._estimate_percentage(voltage)
-                    }
+                # The association list rides along in the same batch to keep the topology current
+                assoc_list, telemetry = station_helper.get_station_status()
+                if assoc_list is not None or telemetry is not None:
+                    self._record_sighting(mac_address, assoc_list)
+                if telemetry is not None and telemetry.voltage is not None:  # Only return result if we got a valid voltage
+                    return self._build_reading(mac_address, ip_address, telemetry.voltage, telemetry)
             else:
-                # Increment failed attempts
-                self.failed_login_attempts[mac_address] = self.failed_login_attempts.get(mac_address, 0) + 1
-                if self.failed_login_attempts[mac_address] >= 3:
-                    self.remove_station(mac_address)
+                self._record_login_failure(mac_address)
         except Exception as e:
+            METRICS.increment(RADIO_FAILURES, ip_address)
             self.logger.error(f"Error processing radio {mac_address}: {str(e)}")
         finally:
             station_helper.logout()
+            METRICS.increment(RADIO_POLL_SECONDS, ip_address, time.perf_counter() - started)
         
         return None
 
-    def _discover_neighbors(self, current_station: 'DoodleHelper', visited: set) -> None:
-        """Discover neighboring stations from the current station."""
+    def _explore_station(self, mac_address: str, ip_address: str, username: str, password: str,
+                         depth: int, deadline: float) -> Tuple[bool, Optional[List[Dict]], Optional[Dict]]:
+        """Probe, log in to and query one radio, returning (responsive, association list, reading).
+
+        Workers still running when the crawl's deadline passes give up before
+        registering a helper or logging in, since their result is discarded.
+        """
+        if time.monotonic() >= deadline or not self._is_radio_responsive(ip_address):
+            return False, None, None
+        if time.monotonic() >= deadline:  # the probe itself may have outlasted the deadline
+            return False, None, None
+
+        station_helper = self._station_helper(mac_address, ip_address, username, password, hops=depth)
         try:
-            stations = current_station.get_associated_stations()
-            if not stations:
-                return
+            if not station_helper.login():
+                return True, None, None
+            # One batched round trip yields both the neighbours and a voltage reading
+            assoc_list, telemetry = station_helper.get_station_status()
+            reading = None
+            if telemetry is not None and telemetry.voltage is not None:
+                reading = self._build_reading(mac_address, ip_address, telemetry.voltage, telemetry)
+            return True, assoc_list, reading
+        finally:
+            station_helper.logout()
 
-            for station in stations:
-                mac_address = station['mac']
-                if mac_address in visited:
-                    continue
+    def _claim_neighbors(self, assoc_list: Optional[List[Dict]], parent: Optional[str], depth: int,
+                         visited: set) -> List[Tuple[str, str, int, Optional[str]]]:
+        """Mark unseen neighbours as visited and return them as the next frontier entries."""
+        frontier = []
+        for station in assoc_list or []:
+            mac_address = station['mac']
+            if mac_address in visited:
+                continue
+            visited.add(mac_address)
+            frontier.append((mac_address, self._mac_to_ip(mac_address), depth, parent))
+        return frontier
 
-                visited.add(mac_address)
-                ip_address = self._mac_to_ip(mac_address)
-
-                # Only add station if it's responsive
-                if self._is_radio_responsive(ip_address):
-                    self.discovered_stations[mac_address] = ip_address
-                    
-                    # Create new helper for this station
-                    station_helper = DoodleHelper(ip_address, 
-                                               current_station.username,
-                                               current_station.password, 
-                                               self.logger)
-                    
-                    if station_helper.login():
-                        self._discover_neighbors(station_helper, visited)
-                        station_helper.logout()
-        except Exception as e:
-            self.logger.error(f"Error discovering neighbors: {str(e)}")
+    def _discover_mesh(self, root_station: 'DoodleHelper', frontier: List[Tuple[str, str, int, Optional[str]]],
+                       visited: Set[str]) -> None:
+        """Crawl the mesh breadth-first from a frontier, exploring each hop level concurrently.
 
-    def update_station_cache(self, root_station: 'DoodleHelper') -> None:
-        """Update the cache of all reachable stations (topology only)."""
-        self.logger.info("Updating radio topology cache...")
-        visited = set()
-        
-        # Reset failed login attempts when updating cache
+        Only the calling thread touches the discovery state; workers just query
+        radios. The crawl stops expanding once the discovery deadline passes.
+        """
+        deadline = time.monotonic() + self.discovery_deadline
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while frontier:
+                # Probe the whole level at once; workers then hit the reachability cache
+                self.reachability.sweep(ip for _, ip, _, _ in frontier)
+                futures = {
+                    executor.submit(self._explore_station, mac, ip, root_station.username, root_station.password,
+                                    depth, deadline): (mac, ip, depth, parent)
+                    for mac, ip, depth, parent in frontier
+                }
+                frontier = []
+                try:
+                    for future in concurrent.futures.as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                        mac_address, ip_address, depth, parent = futures[future]
+                        try:
+                            responsive, assoc_list, reading = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Error discovering neighbors of {mac_address}: {str(e)}")
+                            continue
+                        # Only add station if it's responsive
+                        if not responsive:
+                            continue
+                        self.discovered_stations[mac_address] = ip_address
+                        self.station_depth[mac_address] = depth
+                        self.station_parent[mac_address] = parent
+                        self.missed_sightings[mac_address] = 0
+                        self._record_sighting(mac_address, assoc_list)
+                        if reading is not None:
+                            self.discovery_readings[mac_address] = reading
+                            if self.reading_callback is not None:
+                                self.reading_callback(reading)
+                        frontier.extend(self._claim_neighbors(assoc_list, mac_address, depth + 1, visited))
+                except concurrent.futures.TimeoutError:
+                    self.logger.warning(f"Discovery deadline of {self.discovery_deadline}s reached, "
+                                        f"{sum(not f.done() for f in futures)} radios left unexplored")
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_root_neighbors(self, root_station: 'DoodleHelper') -> Optional[List[Dict]]:
+        assoc_list = root_station.get_associated_stations()
+        if assoc_list is not None:
+            self.root_neighbors = frozenset(station['mac'] for station in assoc_list)
+            self.station_links[None] = {station['mac']: parse_link_quality(station) for station in assoc_list}
+        return assoc_list
+
+    def _clear_topology(self) -> None:
+        """Forget every known station and what was learned about it."""
         self.failed_login_attempts.clear()
         self.discovered_stations.clear()
-        
-        # Start discovery from root station
-        self._discover_neighbors(root_station, visited)
+        self.station_depth.clear()
+        self.station_parent.clear()
+        self.station_neighbors.clear()
+        self.station_links.clear()
+        self.station_paths.clear()
+        self.station_last_seen.clear()
+        self.missed_sightings.clear()
+
+    def _crawl_mesh(self, root_station: 'DoodleHelper') -> None:
+        """Rebuild the topology from scratch, starting at the root station."""
+        # Reset failed login attempts when rebuilding the cache
+        self._clear_topology()
+
+        visited = set()
+        frontier = self._claim_neighbors(self._read_root_neighbors(root_station), None, 1, visited)
+        self._discover_mesh(root_station, frontier, visited)
+
+    def _age_out_stations(self, since: float) -> None:
+        """Count a missed sighting for every station not seen since the last refresh and drop the stale ones."""
+        sighted = set(self.root_neighbors)
+        for mac_address, neighbors in self.station_neighbors.items():
+            # Association lists of radios that stopped answering are not evidence of anything
+            if self.station_last_seen.get(mac_address, 0.0) >= since:
+                sighted.update(neighbors)
+
+        for mac_address in list(self.discovered_stations):
+            if mac_address in sighted or self.station_last_seen.get(mac_address, 0.0) >= since:
+                self.missed_sightings[mac_address] = 0
+                continue
+            self.missed_sightings[mac_address] = self.missed_sightings.get(mac_address, 0) + 1
+            if self.missed_sightings[mac_address] >= MAX_MISSED_SIGHTINGS:
+                self.remove_station(mac_address)
+
+    def _changed_frontier(self, since: float) -> List[Tuple[str, str, int, Optional[str]]]:
+        """Build a frontier of radios that appeared in a current association list but are not known yet."""
+        observers: List[Tuple[Optional[str], int, Iterable[str]]] = [(None, 0, self.root_neighbors)]
+        observers.extend(
+            (mac_address, self.station_depth.get(mac_address, 0), neighbors)
+            for mac_address, neighbors in self.station_neighbors.items()
+            if mac_address in self.discovered_stations and self.station_last_seen.get(mac_address, 0.0) >= since
+        )
+
+        candidates: Dict[str, Tuple[int, Optional[str]]] = {}  # {mac_address: (depth, parent)}
+        for observer, observer_depth, neighbors in observers:
+            for mac_address in neighbors:
+                if mac_address in self.discovered_stations:
+                    continue
+                if mac_address not in candidates or observer_depth + 1 < candidates[mac_address][0]:
+                    candidates[mac_address] = (observer_depth + 1, observer)
+
+        return [(mac, self._mac_to_ip(mac), depth, parent) for mac, (depth, parent) in candidates.items()]
+
+    def _refresh_mesh(self, root_station: 'DoodleHelper') -> None:
+        """Update the topology from association list changes seen since the last refresh."""
+        since = self.last_discovery.timestamp()
+        self._read_root_neighbors(root_station)
+        self._age_out_stations(since)
+
+        frontier = self._changed_frontier(since)
+        if frontier:
+            self.logger.info(f"Exploring {len(frontier)} new radios")
+            visited = set(self.discovered_stations) | {mac for mac, _, _, _ in frontier}
+            self._discover_mesh(root_station, frontier, visited)
+
+    def _link_graph(self) -> Dict[Optional[str], Dict[str, LinkQuality]]:
+        """Undirected links between known radios; a link seen from both ends keeps its worse report."""
+        graph: Dict[Optional[str], Dict[str, LinkQuality]] = {}
+        for observer, links in self.station_links.items():
+            if observer is not None and observer not in self.discovered_stations:
+                continue
+            for neighbor, quality in links.items():
+                if neighbor not in self.discovered_stations:
+                    continue
+                for end, other in ((observer, neighbor), (neighbor, observer)):
+                    if other is None:
+                        continue
+                    known = graph.setdefault(end, {}).get(other)
+                    if known is None or _link_width(quality) < _link_width(known):
+                        graph[end][other] = quality
+        return graph
+
+    def _select_paths(self) -> None:
+        """Give every station the parent on its widest path from the root.
+
+        The widest path is the one whose slowest link has the highest expected
+        throughput, with fewer hops breaking ties. Depth and parent follow the
+        chosen path; stations without link data keep the ones found by the crawl.
+        """
+        graph = self._link_graph()
+        order = itertools.count()
+        # (-path width, hops, tie breaker, mac, parent, link to parent, weakest snr on the path)
+        heap = [(-math.inf, 0, next(order), None, None, None, None)]
+        paths: Dict[str, StationPath] = {}
+        settled: Set[Optional[str]] = set()
+        while heap:
+            negative_width, hops, _, mac_address, parent, link, bottleneck_snr = heapq.heappop(heap)
+            if mac_address in settled:
+                continue
+            settled.add(mac_address)
+            if mac_address is not None:
+                width = -negative_width
+                paths[mac_address] = StationPath(parent, hops, link.snr, bottleneck_snr,
+                                                  width if 0 < width < math.inf else None)
+            for neighbor, quality in graph.get(mac_address, {}).items():
+                if neighbor in settled:
+                    continue
+                width = min(-negative_width, _link_width(quality))
+                snrs = [snr for snr in (bottleneck_snr, quality.snr) if snr is not None]
+                heapq.heappush(heap, (-width, hops + 1, next(order), neighbor, mac_address, quality,
+                                      min(snrs) if snrs else None))
+
+        self.station_paths = paths
+        for mac_address, path in paths.items():
+            self.station_parent[mac_address] = path.parent
+            self.station_depth[mac_address] = path.hops
+
+    def update_station_cache(self, root_station: 'DoodleHelper') -> List[Dict[str, any]]:
+        """Update the cache of all reachable stations and return the readings gathered while doing so.
+
+        The first update crawls the whole mesh. Later updates only explore radios
+        that newly appeared in an association list, and age out radios that have
+        gone unseen for MAX_MISSED_SIGHTINGS refreshes.
+        """
+        self.logger.info("Updating radio topology cache...")
+        self.discovery_readings = {}
+
+        with METRICS.timer(DISCOVERY_SECONDS):
+            if self.last_discovery is None or not self.discovered_stations:
+                self._crawl_mesh(root_station)
+            else:
+                self._refresh_mesh(root_station)
         
         self.last_discovery = datetime.now()
+        self._select_paths()
+        for mac_address, reading in self.discovery_readings.items():
+            # Readings taken during the crawl predate the path selection
+            path = self.station_paths.get(mac_address)
+            if path is not None:
+                reading['link_snr'], reading['path_throughput'] = path.link_snr, path.throughput
+        self.radios.sync(self.discovered_stations)
         self.logger.info(f"Topology cache updated. Found {len(self.discovered_stations)} radios.")
+        return list(self.discovery_readings.values())
+
+    def save_topology(self, path: str) -> None:
+        """Write the discovered topology and failure counters to a versioned JSON file."""
+        topology = {
+            'version': TOPOLOGY_CACHE_VERSION,
+            'saved_at': self.last_discovery.timestamp() if self.last_discovery else time.time(),
+            'root_neighbors': sorted(self.root_neighbors),
+            'root_links': {mac: list(quality) for mac, quality in self.station_links.get(None, {}).items()},
+            'stations': {
+                mac_address: {
+                    'ip_address': ip_address,
+                    'depth': self.station_depth.get(mac_address),
+                    'parent': self.station_parent.get(mac_address),
+                    'neighbors': sorted(self.station_neighbors.get(mac_address, ())),
+                    'links': {mac: list(quality) for mac, quality in self.station_links.get(mac_address, {}).items()},
+                    'last_seen': self.station_last_seen.get(mac_address),
+                    'failed_logins': self.failed_login_attempts.get(mac_address, 0),
+                    'missed_sightings': self.missed_sightings.get(mac_address, 0)
+                }
+                for mac_address, ip_address in self.discovered_stations.items()
+            }
+        }
+        # Write then rename so a crash mid-write never leaves a truncated cache behind
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(topology, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            self.logger.error(f"Failed to save radio topology to {path}: {str(e)}")
+
+    def load_topology(self, path: str) -> bool:
+        """Restore a topology saved by save_topology, returning whether one was loaded.
+
+        The restored topology keeps its original discovery time, so the next
+        update revalidates it incrementally rather than crawling from scratch.
+        """
+        try:
+            with open(path) as f:
+                topology = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable radio topology cache {path}: {str(e)}")
+            return False
+
+        if not isinstance(topology, dict) or topology.get('version') != TOPOLOGY_CACHE_VERSION:
+            version = topology.get('version') if isinstance(topology, dict) else None
+            self.logger.warning(f"Ignoring radio topology cache {path} with version {version}")
+            return False
 
-    def get_station_voltages(self, root_station: 'DoodleHelper') -> List[Dict[str, any]]:
-        """Get fresh voltage readings for all discovered stations concurrently."""
+        try:
+            self.root_neighbors = frozenset(topology['root_neighbors'])
+            self.station_links[None] = {mac: LinkQuality(*quality) for mac, quality in topology['root_links'].items()}
+            for mac_address, station in topology['stations'].items():
+                self.discovered_stations[mac_address] = station['ip_address']
+                if station['depth'] is not None:
+                    self.station_depth[mac_address] = station['depth']
+                self.station_parent[mac_address] = station['parent']
+                self.station_neighbors[mac_address] = frozenset(station['neighbors'])
+                self.station_links[mac_address] = {mac: LinkQuality(*quality)
+                                                   for mac, quality in station['links'].items()}
+                if station['last_seen'] is not None:
+                    self.station_last_seen[mac_address] = station['last_seen']
+                self.failed_login_attempts[mac_address] = station['failed_logins']
+                self.missed_sightings[mac_address] = station['missed_sightings']
+            saved_at = datetime.fromtimestamp(topology['saved_at'])
+            self._select_paths()
+        except (KeyError, TypeError, AttributeError, ValueError, OverflowError, OSError) as e:
+            # A damaged cache must never keep the service from starting; the first update crawls instead
+            self.logger.warning(f"Ignoring malformed radio topology cache {path}: {type(e).__name__}: {str(e)}")
+            self._clear_topology()
+            self.root_neighbors = frozenset()
+            return False
+        self.last_discovery = saved_at
+        self.logger.info(f"Restored {len(self.discovered_stations)} radios from topology cache {path}")
+        return True
+
+    def get_station_voltages(self, root_station: 'DoodleHelper',
+                             skip: Optional[Set[str]] = None) -> List[Dict[str, any]]:
+        """Get fresh voltage readings for all discovered stations concurrently, except those in skip."""
+        stations = [(mac, ip) for mac, ip in self.discovered_stations.items() if skip is None or mac not in skip]
+        reachable = self.reachability.sweep(ip for _, ip in stations)
         station_helpers = [
-            (mac, DoodleHelper(ip, root_station.username, root_station.password, self.logger))
-            for mac, ip in self.discovered_stations.items()
+            (mac, self._station_helper(mac, ip, root_station.username, root_station.password))
+            for mac, ip in stations
+            if reachable[ip]
         ]
+        # Radios with quick, healthy paths first, so marginal ones never hold workers the others are waiting for
+        station_helpers.sort(key=lambda station_info: station_info[1].request_timeout.timeout)
 
         results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             futures = [executor.submit(self._process_station, station_info) 
                       for station_info in station_helpers]
             
@@ -152,113 +703,225 @@ class StationDiscovery:
                     result = future.result()
                     if result is not None:
                         results.append(result)
+                        if self.reading_callback is not None:
+                            self.reading_callback(result)
                 except Exception as e:
                     self.logger.error(f"Error processing radio voltage result: {str(e)}")
 
         return results
 
 class DoodleHelper:
-    def __init__(self, host_ip, username, password, logger):
+    __slots__ = ('host_ip', 'port', 'url', 'username', 'password', 'logger', 'transport', 'token',
+                 '_file_read_denied', 'session_registry', 'request_timeout', '_station_discovery')
+
+    def __init__(self, host_ip, username, password, logger, session_registry: Optional[UbusSessionRegistry] = None,
+                 port: int = UBUS_PORT, transport: Optional[RadioTransport] = None):
         self.host_ip = host_ip
-        self.url = f"https://{host_ip}/ubus"
+        self.port = port
+        self.url = f"https://{host_ip}/ubus" if port == UBUS_PORT else f"https://{host_ip}:{port}/ubus"
         self.username = username
         self.password = password
         self.logger = logger
-        self.session = requests.Session()
-        self.session.verify = False
-        self.station_discovery = StationDiscovery(logger)
+        # Connections live in the shared transport's pool, so helpers are cheap and connections stay warm
+        self.transport = transport if transport is not None else SHARED_TRANSPORT
+        self.token = None
+        self._file_read_denied = False
+        self.session_registry = session_registry
+        self.request_timeout = AdaptiveTimeout()
+        self._station_discovery: Optional[StationDiscovery] = None
+
+    @property
+    def station_discovery(self) -> StationDiscovery:
+        """Discovery state for get_all_reachable_stations, only built for helpers that crawl from themselves."""
+        if self._station_discovery is None:
+            self._station_discovery = StationDiscovery(self.logger, session_registry=self.session_registry,
+                                                       port=self.port, transport=self.transport)
+        return self._station_discovery
+
+    def _post(self, payload: Union[Dict, List[Dict]]) -> Union[Dict, List[Dict]]:
+        started = time.perf_counter()
+        try:
+            response = self.transport.post(self.url, payload, self.request_timeout.timeout)
+        except requests.Timeout:
+            self.request_timeout.expired()
+            METRICS.increment(RADIO_TIMEOUTS, self.host_ip)
+            raise
+        self.request_timeout.observe(time.perf_counter() - started)
+        return response.json()
+
+    def _call(self, ubus_object: str, method: str, arguments: Dict) -> Optional[Dict]:
+        """Make an authenticated ubus call, logging in again once if the session was rejected."""
+        data = self._post(build_call_payload(self.token, ubus_object, method, arguments))
+        if is_access_denied(data):
+            self.logger.debug("Session for %s rejected, logging in again", self.host_ip)
+            if not self.login(force=True):
+                return None
+            data = self._post(build_call_payload(self.token, ubus_object, method, arguments))
+        if self.session_registry is not None and not is_access_denied(data):
+            self.session_registry.touch(self.host_ip, self.token)
+
+        return call_result(data)
+
+    def _post_batch(self, calls: List[Tuple[str, str, Dict]]) -> Dict[int, Dict]:
+        payload = [
+            build_call_payload(self.token, ubus_object, method, arguments, request_id=request_id)
+            for request_id, (ubus_object, method, arguments) in enumerate(calls, start=1)
+        ]
+        responses = self._post(payload)
+        if not isinstance(responses, list):
+            raise ValueError(f"Batch request rejected: {responses.get('error')}")
+        return {response.get('id'): response for response in responses}
+
+    def call_batch(self, calls: List[Tuple[str, str, Dict]]) -> List[Optional[Dict]]:
+        """Make several authenticated ubus calls in one JSON-RPC batch POST.
+
+        Responses are matched to calls by id and returned in call order, with
+        None for calls that failed or returned no data.
+        """
+        responses = self._post_batch(calls)
+        if any(is_access_denied(response) for response in responses.values()):
+            self.logger.debug("Session for %s rejected, logging in again", self.host_ip)
+            if not self.login(force=True):
+                return [None] * len(calls)
+            responses = self._post_batch(calls)
+        if self.session_registry is not None and not any(is_access_denied(response) for response in responses.values()):
+            self.session_registry.touch(self.host_ip, self.token)
+
+        return [call_result(responses.get(request_id)) for request_id in range(1, len(calls) + 1)]
+
+    def login(self, force: bool = False):
+        """Obtain a ubus session, reusing a cached token from the session registry unless forced."""
+        if self.session_registry is not None:
+            if force:
+                self.session_registry.invalidate(self.host_ip, self.token)
+            else:
+                token = self.session_registry.get(self.host_ip)
+                if token is not None:
+                    self.token = token
+                    return True
 
-        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
-        
-    def login(self):
         login_payload = {
             "jsonrpc": "2.0",
             "id": 1,
             "method": "call",
-            "params": ["00000000000000000000000000000000", "session", "login", {"username": self.username, "password": self.password}]
+            "params": [ANONYMOUS_SESSION, "session", "login", {"username": self.username, "password": self.password}]
         }
 
         try:
-            response = self.session.post(self.url, json=login_payload, timeout=REQUEST_TIMEOUT)
-            data = response.json()
+            with METRICS.timer(LOGIN_SECONDS):
+                data = self._post(login_payload)
             if data.get("error"):
+                METRICS.increment(RADIO_FAILURES, self.host_ip)
                 self.logger.error(f"Doodle login failed: {data['error']}")
                 return False
             else:
                 self.logger.debug("Doodle login success")
-                self.token = data["result"][1]["ubus_rpc_session"]
+                session = data["result"][1]
+                self.token = session["ubus_rpc_session"]
+                if self.session_registry is not None:
+                    self.session_registry.store(self.host_ip, self.token, session.get("expires", DEFAULT_SESSION_TIMEOUT))
                 return True
         except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
             self.logger.error(f"Failed to login to radio at {self.url}: {str(e)}")
             return False
     
-    def get_battery_voltage(self) -> Optional[float]:
-        try:
-            get_battery_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "call",
-                "params": [self.token, "file", "exec", {
-                    "command": "cat",
-                    "params": ["/tmp/run/pancake.txt"]
-                }]
-            }
+    def _pancake_call(self) -> Tuple[str, str, Dict]:
+        """Read pancake.txt with file read, which spawns no process, unless the radio does not allow it."""
+        if self._file_read_denied or (self.session_registry is not None
+                                      and not self.session_registry.allows_file_read(self.host_ip)):
+            return PANCAKE_CALL
+        return PANCAKE_READ_CALL
 
-            response = self.session.post(self.url, json=get_battery_payload, timeout=REQUEST_TIMEOUT)
-            data = response.json()
+    def _deny_file_read(self) -> None:
+        self.logger.info(f"Radio at {self.host_ip} does not allow ubus file read, falling back to file exec")
+        self._file_read_denied = True
+        if self.session_registry is not None:
+            self.session_registry.deny_file_read(self.host_ip)
 
-            if 'result' in data and data['result'][1]:
-                stdout = data['result'][1].get('stdout', '')
-                stderr = data['result'][1].get('stderr', '')
+    def _parse_telemetry(self, result: Optional[Dict]) -> Optional[PancakeTelemetry]:
+        if result:
+            stderr = result.get('stderr', '')
+            if stderr:
+                self.logger.debug("Command Errors:\n%s", stderr)
 
-                self.logger.debug(f"Command Errors:\n{stderr if stderr else 'No Errors'}")
-                
-                out = stdout.strip()
-                json_data = json.loads(out)
+            telemetry = parse_pancake(pancake_contents(result))
+            self.logger.debug("Voltage: %sV", telemetry.voltage)
+            return telemetry
 
-                if "VIN VOLTAGE" in json_data:
-                    voltage = float(json_data["VIN VOLTAGE"]) / 20.2
-                    self.logger.debug(f"Voltage: {voltage}V")
-                    return voltage
+        return None
 
-            return None
+    def _read_telemetry_with_exec(self) -> Optional[PancakeTelemetry]:
+        """Retry a failed file read with file exec, remembering the radio needs it if that works."""
+        telemetry = self._parse_telemetry(self._call(*PANCAKE_CALL))
+        if telemetry is not None:
+            self._deny_file_read()
+        return telemetry
+
+    def _parse_associated_stations(self, result: Optional[Dict]) -> Optional[List[Dict]]:
+        if result:
+            assoc_list = result['results']
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Association List:\n{json.dumps(assoc_list, indent=4)}")
+            return assoc_list
+
+        return None
+
+    def get_telemetry(self) -> Optional[PancakeTelemetry]:
+        """Read every field the Pancake board reports in one call."""
+        try:
+            with METRICS.timer(VOLTAGE_READ_SECONDS):
+                pancake_call = self._pancake_call()
+                telemetry = self._parse_telemetry(self._call(*pancake_call))
+                if telemetry is None and pancake_call is PANCAKE_READ_CALL:
+                    telemetry = self._read_telemetry_with_exec()
+                return telemetry
         except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
             self.logger.error(f"Error getting battery voltage from {self.url}: {str(e)}")
             return None
+
+    def get_battery_voltage(self) -> Optional[float]:
+        telemetry = self.get_telemetry()
+        return telemetry.voltage if telemetry is not None else None
     
     def get_associated_stations(self) -> Optional[List[Dict]]:
         try:
-            get_associations_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "call",
-                "params": [self.token, "iwinfo", "assoclist", {
-                    "device": "wlan0"
-                }]
-            }
-
-            response = self.session.post(self.url, json=get_associations_payload, timeout=REQUEST_TIMEOUT)
-            data = response.json()
-
-            if 'result' in data and data['result'][1]:
-                assoc_list = data['result'][1]['results']
-                self.logger.debug(f"Association List:\n{json.dumps(assoc_list, indent=4)}")
-                return assoc_list
-
-            return None
+            return self._parse_associated_stations(self._call(*ASSOCLIST_CALL))
         except Exception as e:
             self.logger.error(f"Error getting associated radios from {self.url}: {str(e)}")
             return None
+
+    def get_station_status(self) -> Tuple[Optional[List[Dict]], Optional[PancakeTelemetry]]:
+        """Read the association list and Pancake telemetry in a single batched round trip."""
+        pancake_call = self._pancake_call()
+        try:
+            with METRICS.timer(VOLTAGE_READ_SECONDS):
+                assoc_result, battery_result = self.call_batch([ASSOCLIST_CALL, pancake_call])
+        except Exception as e:
+            METRICS.increment(RADIO_FAILURES, self.host_ip)
+            self.logger.error(f"Error getting radio status from {self.url}: {str(e)}")
+            return None, None
+
+        assoc_list = self._parse_associated_stations(assoc_result)
+        try:
+            telemetry = self._parse_telemetry(battery_result)
+            if telemetry is None and assoc_list is not None and pancake_call is PANCAKE_READ_CALL:
+                # The session is valid, so the radio refused the file read itself
+                telemetry = self._read_telemetry_with_exec()
+        except Exception as e:
+            self.logger.error(f"Error getting battery voltage from {self.url}: {str(e)}")
+            telemetry = None
+        return assoc_list, telemetry
     
     def get_all_reachable_stations(self) -> List[Dict[str, any]]:
         """Get all reachable stations and their voltages, using cache if available."""
+        readings = []
         if self.station_discovery.should_update_cache():
-            self.station_discovery.update_station_cache(self)
-        return self.station_discovery.get_station_voltages(self)
+            readings = self.station_discovery.update_station_cache(self)
+        skip = {reading['mac_address'] for reading in readings}
+        return readings + self.station_discovery.get_station_voltages(self, skip=skip)
 
     def logout(self):
-        try:
-            self.session.close()
-            self.logger.debug("Doodle logout success")
-        except Exception as e:
-            self.logger.error(f"Error during logout: {str(e)}")
\ No newline at end of file
+        """Release the radio; its keep-alive connection and ubus session are both kept for reuse."""
+        self.logger.debug("Doodle logout success")
@@ -0,0 +1,183 @@
+"""Survey a Doodle mesh from the command line, streaming each radio's reading as it arrives.
+
+    python mesh_scan.py 10.223.68.37 --username configurator --password-file pw.txt --format csv > survey.csv
+    python mesh_scan.py 10.223.68.37 --username configurator --interval 60 | jq .battery_percentage
+
+Readings go to stdout (or --output) one line per radio, flushed immediately,
+so slow radios never hold back the others. Progress and errors go to stderr.
+
+Radios are written as the first scan's crawl reaches them, before the best
+path from the root is known, so rows of scan 1 leave link_snr and
+path_throughput empty. Later scans fill them in for every radio but the root,
+which has no parent link.
+"""
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, Optional, TextIO
+
+from doodle_helper import (DISCOVERY_DEADLINE, HOP_TIMEOUT, MAX_WORKERS, MESH_SUBNET, REQUEST_TIMEOUT, UBUS_PORT,
+                           DoodleHelper, StationDiscovery)
+from ubus_trace import RecordingReachability, RecordingTransport, TraceRecorder
+
+OUTPUT_FORMATS = ('jsonl', 'csv')
+PASSWORD_ENV = 'DOODLE_PASSWORD'  # read when neither --password nor --password-file is given
+RECORD_FIELDS = ('scan', 'timestamp', 'mac_address', 'ip_address', 'hop_depth', 'parent', 'link_snr',
+                 'path_throughput', 'voltage', 'battery_percentage', 'input_current', 'temperature')
+
+_LOGGER = logging.getLogger('mesh_scan')
+
+
+class ReadingWriter:
+    """Writes one record per reading in JSON Lines or CSV, flushing after each."""
+
+    def __init__(self, stream: TextIO, output_format: str):
+        self.stream = stream
+        self.output_format = output_format
+        self._csv = None
+        if output_format == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=RECORD_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+        self.count = 0
+
+    def write(self, record: Dict) -> None:
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+        self.count += 1
+
+
+class MeshScanner:
+    """Runs repeated scans of a mesh, handing every reading to a writer the moment it is taken."""
+
+    def __init__(self, root_station: DoodleHelper, station_discovery: StationDiscovery, writer: ReadingWriter):
+        self.root_station = root_station
+        self.station_discovery = station_discovery
+        self.writer = writer
+        self.scan = 0
+        self._seen = set()  # radios already written during the current scan
+        station_discovery.reading_callback = self._emit
+
+    def _emit(self, reading: Dict) -> None:
+        mac_address = reading['mac_address']
+        if mac_address in self._seen:
+            return
+        if mac_address is not None and reading['ip_address'] == self.root_station.host_ip:
+            # The root radio is reported once, from its own telemetry, when neighbours list it back
+            return
+        self._seen.add(mac_address)
+        self.writer.write({
+            **reading,
+            'scan': self.scan,
+            'hop_depth': 0 if mac_address is None else self.station_discovery.station_depth.get(mac_address),
+            'parent': self.station_discovery.station_parent.get(mac_address),
+        })
+
+    def run_once(self) -> int:
+        """Scan the whole mesh once, returning the number of radios written."""
+        self.scan += 1
+        self._seen = set()
+        written = self.writer.count
+
+        telemetry = self.root_station.get_telemetry()
+        if telemetry is not None and telemetry.voltage is not None:
+            self._emit(self.station_discovery._build_reading(None, self.root_station.host_ip,
+                                                             telemetry.voltage, telemetry))
+        if self.station_discovery.should_update_cache():
+            # Radios explored during the update are written as the crawl reaches them
+            self.station_discovery.update_station_cache(self.root_station)
+        # The root was read above under no MAC; skip it under the MAC its neighbours list it by
+        root_macs = {mac for mac, ip in self.station_discovery.discovered_stations.items()
+                     if ip == self.root_station.host_ip}
+        self.station_discovery.get_station_voltages(self.root_station, skip=self._seen | root_macs)
+        return self.writer.count - written
+
+
+def _read_password(options) -> Optional[str]:
+    if options.password is not None:
+        return options.password
+    if options.password_file is not None:
+        with open(options.password_file, 'r') as password_file:
+            return password_file.readline().rstrip('\n')
+    return os.environ.get(PASSWORD_ENV)
+
+
+def main() -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description='Stream battery readings of every radio in a Doodle mesh.')
+    parser.add_argument('root_ip', help='Address of the radio the scan starts from.')
+    parser.add_argument('--username', required=True, help='ubus user on every radio.')
+    parser.add_argument('--password', default=None, help=f'ubus password; prefer --password-file or ${PASSWORD_ENV}.')
+    parser.add_argument('--password-file', default=None, help='File whose first line is the ubus password.')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl', help='Output record format.')
+    parser.add_argument('--output', default=None, help='File to write records to instead of stdout.')
+    parser.add_argument('--concurrency', type=int, default=MAX_WORKERS, help='Radios queried at once.')
+    parser.add_argument('--deadline', type=float, default=DISCOVERY_DEADLINE,
+                        help='Seconds allowed for crawling the mesh topology.')
+    parser.add_argument('--crawl-timeout', type=float, default=REQUEST_TIMEOUT,
+                        help='Seconds each request to a radio may take while the first crawl reaches it; '
+                             f'0 budgets {HOP_TIMEOUT:g}s per hop instead.')
+    parser.add_argument('--interval', type=float, default=0.0,
+                        help='Seconds between the start of two scans; 0 scans once.')
+    parser.add_argument('--count', type=int, default=0, help='Number of scans with --interval; 0 runs until interrupted.')
+    parser.add_argument('--port', type=int, default=UBUS_PORT, help='Port the radios serve ubus on.')
+    parser.add_argument('--subnet', default=MESH_SUBNET, help='First two octets of the mesh addresses.')
+    parser.add_argument('--record-trace', default=None,
+                        help='Record all ubus traffic to this gzip trace file for ubus_trace.py to replay.')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log progress and radio errors to stderr.')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if options.verbose else logging.CRITICAL, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    password = _read_password(options)
+    if password is None:
+        parser.error(f"a password is required: use --password, --password-file or ${PASSWORD_ENV}")
+
+    trace_recorder = transport = reachability = None
+    if options.record_trace is not None:
+        trace_recorder = TraceRecorder(options.record_trace)
+        transport = RecordingTransport(trace_recorder)
+        reachability = RecordingReachability(trace_recorder, port=options.port)
+
+    station_discovery = StationDiscovery(_LOGGER, discovery_deadline=options.deadline,
+                                         max_workers=options.concurrency, mesh_subnet=options.subnet,
+                                         port=options.port, transport=transport, reachability=reachability,
+                                         crawl_timeout=options.crawl_timeout or None)
+    root_station = DoodleHelper(options.root_ip, options.username, password, _LOGGER,
+                                session_registry=station_discovery.session_registry, port=options.port,
+                                transport=transport)
+    stream = None
+    try:
+        if not root_station.login():
+            print(f"Could not log in to {options.root_ip}", file=sys.stderr)
+            return 1
+
+        stream = open(options.output, 'w', newline='') if options.output else sys.stdout
+        scanner = MeshScanner(root_station, station_discovery, ReadingWriter(stream, options.format))
+        while True:
+            started = time.monotonic()
+            written = scanner.run_once()
+            _LOGGER.info(f"Scan {scanner.scan}: {written} radios in {time.monotonic() - started:.2f}s")
+            if options.interval <= 0 or (options.count and scanner.scan >= options.count):
+                break
+            time.sleep(max(0.0, options.interval - (time.monotonic() - started)))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        if stream is not None:
+            root_station.logout()
+            if stream is not sys.stdout:
+                stream.close()
+        if trace_recorder is not None:
+            trace_recorder.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
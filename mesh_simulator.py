@@ -0,0 +1,308 @@
+"""Local stand-in for a Doodle mesh, serving fake ubus endpoints over HTTPS.
+
+Every simulated radio listens on its own loopback address derived from its MAC
+with the same scheme StationDiscovery uses (127.223.x.y by default, which Linux
+routes to lo without any setup), so the real discovery and polling code can be
+pointed at it unchanged:
+
+    python mesh_simulator.py --radios 100 --latency 0.02 --loss 0.01 --dead 0.05
+"""
+import asyncio
+import json
+import os
+import random
+import secrets
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from doodle_helper import ANONYMOUS_SESSION, DEFAULT_SESSION_TIMEOUT, VOLTAGE_DIVIDER
+
+SIMULATOR_SUBNET = "127.223"  # loopback range, so no interface setup is needed on Linux
+SIMULATOR_PORT = 8443  # unprivileged stand-in for the radios' HTTPS port
+SIMULATOR_USERNAME = "configurator"
+SIMULATOR_PASSWORD = "test"
+DEFAULT_FANOUT = 3  # neighbours each radio links to further away from the root
+DEFAULT_DRAIN_RATE = 0.2  # volts per hour every simulated battery loses
+PANCAKE_PATH = "/tmp/run/pancake.txt"
+
+# rpcd answers a call made with an unknown session like this
+_ACCESS_DENIED = {"code": -32002, "message": "Access denied"}
+UBUS_STATUS_OK = 0
+UBUS_STATUS_PERMISSION_DENIED = 6
+
+
+def _self_signed_certificate(directory: str) -> Tuple[str, str]:
+    """Create a throwaway certificate with the openssl CLI, like the one a radio ships with."""
+    cert_path = os.path.join(directory, "radio.crt")
+    key_path = os.path.join(directory, "radio.key")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=doodle-simulator", "-keyout", key_path, "-out", cert_path],
+                   check=True, capture_output=True)
+    return cert_path, key_path
+
+
+class SimulatedRadio:
+    """State of one fake radio: identity, battery and neighbour links."""
+
+    def __init__(self, mac_address: str, ip_address: str, voltage: float, state: str = 'alive'):
+        self.mac_address = mac_address
+        self.ip_address = ip_address
+        self.initial_voltage = voltage
+        self.state = state  # 'alive', 'dead' (refuses connections) or 'hung' (accepts, never answers)
+        self.links: Dict[str, Dict] = {}  # {neighbour mac_address: link quality}
+
+    def voltage(self, elapsed: float, drain_rate: float) -> float:
+        return self.initial_voltage - drain_rate * elapsed / 3600.0
+
+    def assoclist(self) -> List[Dict]:
+        return [{"mac": mac_address, **link} for mac_address, link in self.links.items()]
+
+
+class SimulatedMesh:
+    """A set of fake radios, each answering ubus JSON-RPC on its own address.
+
+    Radios form a tree of the given fanout rooted at radio 0, plus optional
+    cross links, so the crawl has a realistic number of hops. All endpoints
+    are served from one asyncio loop on a background thread.
+
+    latency is the mean delay added to every response, loss the probability
+    that a request is silently never answered, and dead/hung the fraction of
+    radios (never the root) that refuse connections or accept and stall.
+    """
+
+    def __init__(self, radio_count: int, subnet: str = SIMULATOR_SUBNET, port: int = SIMULATOR_PORT,
+                 latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, dead: float = 0.0,
+                 hung: float = 0.0, fanout: int = DEFAULT_FANOUT, cross_links: int = 0,
+                 drain_rate: float = DEFAULT_DRAIN_RATE, session_timeout: int = DEFAULT_SESSION_TIMEOUT,
+                 username: str = SIMULATOR_USERNAME, password: str = SIMULATOR_PASSWORD, seed: int = 0):
+        self.subnet = subnet
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.drain_rate = drain_rate
+        self.session_timeout = session_timeout
+        self.username = username
+        self.password = password
+        self._random = random.Random(seed)
+        self.radios: List[SimulatedRadio] = self._build_radios(radio_count, dead, hung)
+        self._build_links(fanout, cross_links)
+        self.stats = Counter()  # request, connection and per-call counts since the last reset
+        self._sessions: Dict[str, float] = {}  # {token: expires_at}
+        self._started = time.time()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._servers = []
+        self._writers = set()
+        self._ready = threading.Event()
+
+    @property
+    def root(self) -> SimulatedRadio:
+        return self.radios[0]
+
+    def _build_radios(self, radio_count: int, dead: float, hung: float) -> List[SimulatedRadio]:
+        radios = []
+        for index in range(radio_count):
+            # The last two MAC bytes become the last two address octets
+            high, low = divmod(index, 250)
+            mac_address = f"00:30:1a:4e:{high:02x}:{low + 1:02x}"
+            state = 'alive'
+            if index > 0:
+                draw = self._random.random()
+                state = 'dead' if draw < dead else 'hung' if draw < dead + hung else 'alive'
+            radios.append(SimulatedRadio(mac_address, f"{self.subnet}.{high}.{low + 1}",
+                                         self._random.uniform(6.8, 8.2), state))
+        return radios
+
+    def _link(self, first: SimulatedRadio, second: SimulatedRadio) -> None:
+        signal = self._random.randint(-88, -45)
+        noise = self._random.randint(-98, -92)
+        rate = max(6500, int((signal + 95) * 20000))  # kbit/s, roughly tracking the SNR
+        for radio, neighbour in ((first, second), (second, first)):
+            radio.links[neighbour.mac_address] = {
+                "signal": signal, "noise": noise, "inactive": self._random.randint(0, 200),
+                "expected_throughput": rate // 2,
+                "rx": {"rate": rate, "mcs": min(7, rate // 20000)},
+                "tx": {"rate": rate, "mcs": min(7, rate // 20000)},
+            }
+
+    def _build_links(self, fanout: int, cross_links: int) -> None:
+        for index in range(1, len(self.radios)):
+            self._link(self.radios[(index - 1) // fanout], self.radios[index])
+        for _ in range(cross_links if len(self.radios) > 2 else 0):
+            first, second = self._random.sample(self.radios, 2)
+            if second.mac_address not in first.links:
+                self._link(first, second)
+
+    def reset_stats(self) -> None:
+        self.stats.clear()
+
+    def _pancake(self, radio: SimulatedRadio) -> str:
+        voltage = radio.voltage(time.time() - self._started, self.drain_rate)
+        return json.dumps({
+            "VIN VOLTAGE": round(voltage * VOLTAGE_DIVIDER, 2),
+            "VIN CURRENT": round(self._random.uniform(0.3, 0.9), 3),
+            "TEMPERATURE": round(self._random.uniform(30.0, 55.0), 1),
+        })
+
+    def _handle_call(self, radio: SimulatedRadio, request: Dict) -> Dict:
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        token, ubus_object, method, arguments = request.get("params", [None, None, None, {}])
+        self.stats[f"{ubus_object} {method}"] += 1
+
+        if (ubus_object, method) == ("session", "login"):
+            if token != ANONYMOUS_SESSION or arguments.get("username") != self.username \
+                    or arguments.get("password") != self.password:
+                response["result"] = [UBUS_STATUS_PERMISSION_DENIED]
+                return response
+            token = secrets.token_hex(16)
+            self._sessions[token] = time.time() + self.session_timeout
+            response["result"] = [UBUS_STATUS_OK, {"ubus_rpc_session": token, "timeout": self.session_timeout,
+                                                   "expires": self.session_timeout}]
+            return response
+
+        expires_at = self._sessions.get(token)
+        if expires_at is None or expires_at < time.time():
+            response["error"] = _ACCESS_DENIED
+            return response
+        self._sessions[token] = time.time() + self.session_timeout
+
+        if (ubus_object, method) == ("iwinfo", "assoclist"):
+            response["result"] = [UBUS_STATUS_OK, {"results": radio.assoclist()}]
+        elif (ubus_object, method) == ("file", "exec") and arguments.get("params") == [PANCAKE_PATH]:
+            response["result"] = [UBUS_STATUS_OK, {"code": 0, "stdout": self._pancake(radio), "stderr": ""}]
+        elif (ubus_object, method) == ("file", "read") and arguments.get("path") == PANCAKE_PATH:
+            response["result"] = [UBUS_STATUS_OK, {"data": self._pancake(radio)}]
+        else:
+            response["result"] = [UBUS_STATUS_PERMISSION_DENIED]
+        return response
+
+    def _handle_payload(self, radio: SimulatedRadio, payload):
+        if isinstance(payload, list):
+            return [self._handle_call(radio, request) for request in payload]
+        return self._handle_call(radio, payload)
+
+    async def _serve_connection(self, radio: SimulatedRadio, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        self.stats['connections'] += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                self.stats['requests'] += 1
+
+                if radio.state == 'hung' or self._random.random() < self.loss:
+                    # Never answer; the client gives up on its own timeout
+                    self.stats['dropped'] += 1
+                    await reader.read()
+                    return
+                delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                try:
+                    data = json.dumps(self._handle_payload(radio, json.loads(body))).encode()
+                    status = "200 OK"
+                except (ValueError, TypeError):
+                    data = json.dumps({"jsonrpc": "2.0", "id": None,
+                                       "error": {"code": -32700, "message": "Parse error"}}).encode()
+                    status = "400 Bad Request"
+                writer.write((f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n\r\n").encode('latin-1') + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _start_servers(self, ssl_context: ssl.SSLContext) -> None:
+        for radio in self.radios:
+            if radio.state == 'dead':
+                continue
+            server = await asyncio.start_server(
+                lambda reader, writer, radio=radio: self._serve_connection(radio, reader, writer),
+                radio.ip_address, self.port, ssl=ssl_context)
+            self._servers.append(server)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        with tempfile.TemporaryDirectory() as directory:
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_context.load_cert_chain(*_self_signed_certificate(directory))
+        self._loop.run_until_complete(self._start_servers(ssl_context))
+        self._ready.set()
+        self._loop.run_forever()
+        for server in self._servers:
+            server.close()
+        # Connections to hung radios are still parked waiting on their clients
+        for writer in list(self._writers):
+            writer.transport.abort()
+        self._loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True))
+        self._loop.close()
+
+    def start(self) -> None:
+        """Start serving every radio on a background thread and wait until they all listen."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='mesh-simulator', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve a simulated Doodle mesh on loopback addresses.')
+    parser.add_argument('--radios', type=int, default=10, help='Number of radios, including the root.')
+    parser.add_argument('--subnet', default=SIMULATOR_SUBNET, help='First two octets of the radio addresses.')
+    parser.add_argument('--port', type=int, default=SIMULATOR_PORT, help='Port every radio listens on.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean seconds added to every response.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Seconds the latency varies by either way.')
+    parser.add_argument('--loss', type=float, default=0.0, help='Probability that a request is never answered.')
+    parser.add_argument('--dead', type=float, default=0.0, help='Fraction of radios that refuse connections.')
+    parser.add_argument('--hung', type=float, default=0.0, help='Fraction of radios that accept but never answer.')
+    parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT, help='Children per radio in the mesh tree.')
+    parser.add_argument('--cross-links', type=int, default=0, help='Extra random links added to the tree.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the topology, voltages and faults.')
+    options = parser.parse_args()
+
+    mesh = SimulatedMesh(options.radios, subnet=options.subnet, port=options.port, latency=options.latency,
+                         jitter=options.jitter, loss=options.loss, dead=options.dead, hung=options.hung,
+                         fanout=options.fanout, cross_links=options.cross_links, seed=options.seed)
+    with mesh:
+        print(f"Serving {len(mesh.radios)} radios, root at https://{mesh.root.ip_address}:{mesh.port}/ubus "
+              f"({mesh.username}/{mesh.password}). Ctrl-C to stop.")
+        try:
+            while True:
+                time.sleep(60)
+                print(dict(mesh.stats))
+        except KeyboardInterrupt:
+            pass
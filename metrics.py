@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# Upper bounds in seconds; radio round trips range from milliseconds to the 2 s request timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+METRICS_HOST = '127.0.0.1'  # the endpoint is only served locally unless asked otherwise
+METRICS_PATH = '/metrics'
+
+# Metric names shared by the modules that record them
+PROBE_SECONDS = 'doodle_probe_seconds'
+LOGIN_SECONDS = 'doodle_login_seconds'
+VOLTAGE_READ_SECONDS = 'doodle_voltage_read_seconds'
+DISCOVERY_SECONDS = 'doodle_discovery_seconds'
+POLL_CYCLE_SECONDS = 'doodle_poll_cycle_seconds'
+LIVE_DATA_SECONDS = 'doodle_live_data_seconds'
+RADIO_POLL_SECONDS = 'doodle_radio_poll_seconds_total'
+RADIO_TIMEOUTS = 'doodle_radio_timeouts_total'
+RADIO_FAILURES = 'doodle_radio_failures_total'
+SNAPSHOT_AGE = 'doodle_snapshot_age_seconds'
+OPEN_CIRCUITS = 'doodle_open_circuits'
+POLLER_RESTARTS = 'doodle_poller_restarts_total'
+TLS_HANDSHAKES = 'doodle_tls_full_handshakes_total'
+TLS_RESUMPTIONS = 'doodle_tls_resumed_handshakes_total'
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot counts values above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms, per-radio counters and gauges.
+
+    Recording is a dict lookup and a bisect under one lock, cheap enough for
+    every radio round trip. Gauges are callables evaluated only when the
+    metrics are rendered.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Optional[str]], float] = {}  # {(name, radio): value}
+        self._gauges: Dict[str, Callable[[], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one duration in the histogram called name."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record how long the enclosed block took, whether or not it raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def increment(self, name: str, radio: Optional[str] = None, amount: float = 1) -> None:
+        """Add amount to a counter, optionally kept separately per radio."""
+        key = (name, radio)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_gauge(self, name: str, read: Callable[[], Optional[float]]) -> None:
+        """Report the value returned by read each time the metrics are rendered; None omits it."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def render(self) -> str:
+        """Format every metric in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {name: (histogram.bounds, list(histogram.counts), histogram.sum, histogram.count)
+                          for name, histogram in self._histograms.items()}
+            counters = sorted(self._counters.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+            gauges = list(self._gauges.items())
+
+        lines = []
+        for name, (bounds, counts, total, count) in sorted(histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{name}_sum {total}")
+            lines.append(f"{name}_count {count}")
+
+        typed = set()
+        for (name, radio), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f'{name}{{radio="{radio}"}} {value}' if radio is not None else f"{name} {value}")
+
+        for name, read in sorted(gauges, key=lambda item: item[0]):
+            value = read()
+            if value is not None:
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()  # process-wide registry every module records into
+
+
+class MetricsServer:
+    """Serves a registry over plain HTTP from a background thread."""
+
+    def __init__(self, port: int, host: str = METRICS_HOST, registry: MetricsRegistry = METRICS):
+        registry_ = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != METRICS_PATH:
+                    self.send_error(404)
+                    return
+                body = registry_.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MIN_POLL_INTERVAL = 1.0  # seconds between polls of a radio that is nearly empty or draining fast
+BASE_POLL_INTERVAL = 5.0  # seconds between polls of a radio whose discharge rate is not known yet
+MAX_POLL_INTERVAL = 30.0  # seconds between polls of a healthy radio with a steady battery
+LOW_BATTERY_PERCENTAGE = 25.0  # at or below this a radio is polled at MIN_POLL_INTERVAL
+FAST_DRAIN_RATE = 10.0  # %/h; at or above this a radio is polled at MIN_POLL_INTERVAL
+FAILURE_BACKOFF = 2.0  # seconds before the first retry of a failed radio, doubled on every failure
+MAX_FAILURE_BACKOFF = 300.0  # seconds; longest a failing radio is left alone
+FAILURES_TO_OPEN = 3  # consecutive failures before a radio's circuit opens
+
+CIRCUIT_CLOSED = 'closed'  # polled on its adaptive interval
+CIRCUIT_OPEN = 'open'  # left alone until its backoff expires
+CIRCUIT_HALF_OPEN = 'half-open'  # one trial poll decides whether it closes or opens again
+
+
+class _RadioSchedule:
+    __slots__ = ('next_due', 'failures', 'circuit')
+
+    def __init__(self, next_due: float):
+        self.next_due = next_due
+        self.failures = 0
+        self.circuit = CIRCUIT_CLOSED
+
+
+def poll_interval(battery_percentage: Optional[float], discharge_rate: Optional[float]) -> float:
+    """Seconds until a healthy radio is polled again, shorter the sooner its battery may run out."""
+    if battery_percentage is not None and battery_percentage <= LOW_BATTERY_PERCENTAGE:
+        return MIN_POLL_INTERVAL
+    if discharge_rate is None:
+        return BASE_POLL_INTERVAL
+    if discharge_rate >= FAST_DRAIN_RATE:
+        return MIN_POLL_INTERVAL
+    # Steady or charging radios get the longest interval, shrinking linearly towards FAST_DRAIN_RATE
+    drain = max(0.0, discharge_rate) / FAST_DRAIN_RATE
+    return MAX_POLL_INTERVAL - (MAX_POLL_INTERVAL - MIN_POLL_INTERVAL) * drain
+
+
+class PollScheduler:
+    """Decides which radios are due for a poll, keeping them in a heap ordered by due time.
+
+    Healthy radios are rescheduled on an interval adapted to their battery.
+    Failing radios back off exponentially; after FAILURES_TO_OPEN failures in a
+    row their circuit opens and they are skipped until the backoff expires,
+    when a single half-open trial poll either closes the circuit or reopens it
+    with a longer backoff. Radios are never dropped here; the topology refresh
+    ages out radios that disappeared from the mesh.
+
+    Heap entries are not removed when a radio is rescheduled; an entry whose
+    due time no longer matches the radio's is skipped when popped.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._radios: Dict[str, _RadioSchedule] = {}
+        self._heap: List[Tuple[float, str]] = []  # (due time, mac_address)
+        self._lock = threading.Lock()
+
+    def _schedule(self, mac_address: str, radio: _RadioSchedule, next_due: float) -> None:
+        radio.next_due = next_due
+        heapq.heappush(self._heap, (next_due, mac_address))
+
+    def sync(self, mac_addresses: Iterable[str]) -> None:
+        """Track exactly the given radios; new ones are due immediately."""
+        now = self.clock()
+        keep = set(mac_addresses)
+        with self._lock:
+            for mac_address in [mac for mac in self._radios if mac not in keep]:
+                del self._radios[mac_address]
+            for mac_address in keep:
+                if mac_address not in self._radios:
+                    radio = self._radios[mac_address] = _RadioSchedule(now)
+                    self._schedule(mac_address, radio, now)
+            if len(self._heap) > 4 * len(self._radios) + 64:
+                # Rebuild once stale entries dominate, so the heap stays proportional to the mesh
+                self._heap = [(radio.next_due, mac) for mac, radio in self._radios.items()]
+                heapq.heapify(self._heap)
+
+    def due(self) -> List[str]:
+        """Pop every radio whose poll is due, moving expired open circuits to half-open."""
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                next_due, mac_address = heapq.heappop(self._heap)
+                radio = self._radios.get(mac_address)
+                if radio is None or radio.next_due != next_due:
+                    continue
+                if radio.circuit == CIRCUIT_OPEN:
+                    radio.circuit = CIRCUIT_HALF_OPEN
+                # Held back until its outcome reschedules it, or retried if no outcome is ever recorded
+                self._schedule(mac_address, radio, now + MAX_POLL_INTERVAL)
+                due.append(mac_address)
+        return due
+
+    def record_success(self, mac_address: str, battery_percentage: Optional[float] = None,
+                       discharge_rate: Optional[float] = None) -> None:
+        """Close the radio's circuit and schedule its next poll from its battery state."""
+        with self._lock:
+            radio = self._radios.get(mac_address)
+            if radio is None:
+                return
+            radio.failures = 0
+            radio.circuit = CIRCUIT_CLOSED
+            self._schedule(mac_address, radio, self.clock() + poll_interval(battery_percentage, discharge_rate))
+
+    def record_failure(self, mac_address: str) -> None:
+        """Back the radio off, opening its circuit after repeated failures or a failed trial."""
+        with self._lock:
+            radio = self._radios.get(mac_address)
+            if radio is None:
+                return
+            radio.failures += 1
+            if radio.circuit == CIRCUIT_HALF_OPEN or radio.failures >= FAILURES_TO_OPEN:
+                radio.circuit = CIRCUIT_OPEN
+            backoff = min(MAX_FAILURE_BACKOFF, FAILURE_BACKOFF * 2 ** min(radio.failures - 1, 16))
+            self._schedule(mac_address, radio, self.clock() + backoff)
+
+    def circuit(self, mac_address: str) -> Optional[str]:
+        """Return the circuit state of a radio, or None if it is not scheduled."""
+        with self._lock:
+            radio = self._radios.get(mac_address)
+            return radio.circuit if radio is not None else None
+
+    def open_circuits(self) -> int:
+        """Count the radios currently skipped because their circuit is open."""
+        with self._lock:
+            return sum(radio.circuit == CIRCUIT_OPEN for radio in self._radios.values())
@@ -0,0 +1,208 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Mapping, Optional
+
+from async_doodle_helper import MAX_CONCURRENCY
+from doodle_helper import DoodleHelper, PancakeTelemetry, StationDiscovery
+from metrics import METRICS, POLLER_RESTARTS, SNAPSHOT_AGE
+from shared_snapshot import MAX_RADIOS, SnapshotReader, SnapshotWriter, segment_size
+from startup_timer import StartupTimer
+from station_poller import (DEFAULT_MAX_SNAPSHOT_AGE, DEFAULT_POLL_BACKEND, DEFAULT_POLL_INTERVAL, EMPTY_SNAPSHOT,
+                            READINESS_STARTING, SnapshotSource, StationPoller, StationSnapshot)
+
+HEARTBEAT_TIMEOUT = 120.0  # seconds without a heartbeat before a worker counts as hung; covers a full mesh crawl
+SUPERVISE_INTERVAL = 1.0  # seconds between two checks of the worker
+PARENT_CHECK_INTERVAL = 1.0  # seconds between two checks by the worker that the service is still running
+MIN_RESTART_DELAY = 1.0  # seconds before restarting a worker that died
+MAX_RESTART_DELAY = 60.0  # ceiling of the doubling restart delay of a worker that keeps dying
+STABLE_RUN = 300.0  # seconds a worker must stay up before its restart delay is reset
+STOP_TIMEOUT = 5.0  # seconds a stopping worker is given before it is terminated
+
+READINESS_POLLER_RESTARTING = 'poller restarting'
+
+
+class _SharedMemoryPoller(StationPoller):
+    """StationPoller that also publishes every snapshot, its readiness and a heartbeat to shared memory."""
+
+    def __init__(self, writer: SnapshotWriter, *args, **kwargs):
+        self.writer = writer
+        super().__init__(*args, **kwargs)
+        # Versions carry on from the previous worker's, so readers never see an old version with new readings
+        self._snapshot = EMPTY_SNAPSHOT._replace(version=writer.version())
+
+    @property
+    def readiness(self) -> str:
+        return self._readiness
+
+    @readiness.setter
+    def readiness(self, readiness: str) -> None:
+        self._readiness = readiness
+        self.writer.set_readiness(readiness)
+
+    def _publish(self, readings, local_station) -> StationSnapshot:
+        snapshot = super()._publish(readings, local_station)
+        self.writer.write(snapshot, self.station_discovery.station_depth)
+        self.writer.beat()
+        return snapshot
+
+    def poll_once(self) -> StationSnapshot:
+        self.writer.beat()
+        return super().poll_once()
+
+
+def _run_worker(segment_name: str, capacity: int, log_level: int, host_ip: str, username: str, password: str,
+                poller_options: Dict) -> None:
+    """Entry point of the worker process: poll the mesh until SIGTERM or until the service goes away."""
+    # A shared multiprocessing.Event would stay locked forever if a hung worker were killed while waiting on it
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    # Ctrl-C reaches the whole process group; the service stops the worker itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('station_poller_worker')
+    parent_pid = os.getppid()
+
+    segment = SharedMemory(name=segment_name)
+    try:
+        writer = SnapshotWriter(segment.buf, logger, capacity=capacity)
+        writer.beat()
+        root_station = DoodleHelper(host_ip, username, password, logger)
+        poller = _SharedMemoryPoller(writer, root_station, logger, startup_timer=StartupTimer(logger),
+                                     **poller_options)
+        poller.start()
+        while not stop_event.wait(PARENT_CHECK_INTERVAL):
+            if os.getppid() != parent_pid:
+                logger.warning("Service process went away, stopping the poller worker")
+                break
+        poller.stop(STOP_TIMEOUT)
+        root_station.logout()
+    finally:
+        segment.close()
+
+
+class ProcessStationPoller(SnapshotSource):
+    """Runs station polling in a supervised worker process and reads its snapshots from shared memory.
+
+    Heavy polls, JSON decoding and TLS then never compete with the gRPC
+    servicer threads for the GIL. The worker is a StationPoller publishing
+    every snapshot into a fixed-layout shared memory segment, which readers
+    decode without locks or copies through the pipe. A supervisor thread
+    restarts the worker, with a doubling delay, when it exits or stops
+    sending heartbeats. Poll metrics are recorded in the worker and are not
+    served by this process; the snapshot age and worker restarts are.
+    """
+
+    def __init__(self, host_ip: str, username: str, password: str, logger,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_snapshot_age: float = DEFAULT_MAX_SNAPSHOT_AGE,
+                 backend: str = DEFAULT_POLL_BACKEND, max_concurrency: int = MAX_CONCURRENCY,
+                 topology_cache_path: Optional[str] = None, capacity: int = MAX_RADIOS,
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT):
+        self.host_ip = host_ip
+        self.logger = logger
+        self.max_snapshot_age = max_snapshot_age
+        self.capacity = capacity
+        self.heartbeat_timeout = heartbeat_timeout
+        self._worker_args = (host_ip, username, password, {
+            'poll_interval': poll_interval, 'max_snapshot_age': max_snapshot_age, 'backend': backend,
+            'max_concurrency': max_concurrency, 'topology_cache_path': topology_cache_path})
+        # Only builds readings of the local radio read live by the service; it never crawls the mesh
+        self._reading_builder = StationDiscovery(logger)
+        self._segment = SharedMemory(create=True, size=segment_size(capacity))
+        self._reader = SnapshotReader(self._segment.buf, capacity=capacity)
+        # A spawned worker does not inherit the gRPC threads and locks of this process
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._process_started = 0.0
+        self._stopping = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+        self.restarts = 0
+        METRICS.register_gauge(SNAPSHOT_AGE, lambda: self.get_snapshot().age())
+
+    def _spawn(self) -> None:
+        # A fresh worker gets a full heartbeat timeout to start up, and does not inherit its predecessor's readiness
+        writer = SnapshotWriter(self._segment.buf, self.logger, capacity=self.capacity)
+        writer.set_readiness(READINESS_STARTING)
+        writer.beat()
+        self._process = self._context.Process(
+            target=_run_worker, name='station-poller-worker', daemon=True,
+            args=(self._segment.name, self.capacity, logging.getLogger().getEffectiveLevel(), *self._worker_args))
+        self._process.start()
+        self._process_started = time.monotonic()
+        self.logger.info(f"Started poller worker process {self._process.pid}")
+
+    def _supervise(self) -> None:
+        restart_delay = MIN_RESTART_DELAY
+        while not self._stopping.wait(SUPERVISE_INTERVAL):
+            if self._process.is_alive():
+                silence = time.monotonic() - self._reader.heartbeat()
+                if silence <= self.heartbeat_timeout:
+                    if time.monotonic() - self._process_started > STABLE_RUN:
+                        restart_delay = MIN_RESTART_DELAY
+                    continue
+                self.logger.error(f"Poller worker {self._process.pid} sent no heartbeat for {silence:.0f}s, "
+                                  f"killing it")
+                self._process.kill()
+                self._process.join()
+            self.logger.error(f"Poller worker {self._process.pid} exited with code {self._process.exitcode}, "
+                              f"restarting it in {restart_delay:.0f}s")
+            if self._stopping.wait(restart_delay):
+                return
+            restart_delay = min(MAX_RESTART_DELAY, restart_delay * 2)
+            self._spawn()
+            self.restarts += 1
+            METRICS.increment(POLLER_RESTARTS)
+
+    def start(self) -> None:
+        """Start the worker process and its supervisor if they are not already running."""
+        if self._supervisor is not None and self._supervisor.is_alive():
+            return
+        self._stopping.clear()
+        self._spawn()
+        self._supervisor = threading.Thread(target=self._supervise, name='station-poller-supervisor', daemon=True)
+        self._supervisor.start()
+
+    def stop(self, timeout: Optional[float] = STOP_TIMEOUT) -> None:
+        """Stop the supervisor and ask the worker to exit, killing it if it has not within timeout."""
+        self._stopping.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+
+    def close(self) -> None:
+        """Stop polling and release the shared memory segment."""
+        self.stop()
+        METRICS.register_gauge(SNAPSHOT_AGE, lambda: None)
+        self._segment.close()
+        self._segment.unlink()
+
+    @property
+    def readiness(self) -> str:
+        if self._process is None:
+            return READINESS_STARTING
+        if not self._process.is_alive():
+            return READINESS_POLLER_RESTARTING
+        return self._reader.readiness()
+
+    def get_snapshot(self) -> StationSnapshot:
+        """Return the latest snapshot published by the worker, whatever its age."""
+        return self._reader.read()
+
+    def hop_depths(self) -> Mapping[str, int]:
+        """{mac_address: hops from the root radio} of every radio in the latest snapshot."""
+        return {station['mac_address']: station['hop_depth'] for station in self.get_snapshot().stations
+                if station['hop_depth'] is not None}
+
+    def build_local_reading(self, telemetry: PancakeTelemetry) -> Dict:
+        """Build the reading of the local radio from telemetry the service read itself."""
+        return self._reading_builder._build_reading(None, self.host_ip, telemetry.voltage, telemetry)
@@ -0,0 +1,176 @@
+import math
+import threading
+from array import array
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+MISSING = math.nan  # stored in the reading arrays for values a radio did not report
+TREND_RESOLUTION = 0.1  # %/h and h; the signal resolution of discharge rates and times to empty
+
+
+class _Radio:
+    """Identity, addressing and per-radio state that outlives any single poll."""
+
+    __slots__ = ('mac_address', 'ip_address', 'slot', 'helper', 'fields', 'view', 'trend')
+
+    def __init__(self, mac_address: str, ip_address: str, slot: int):
+        self.mac_address = mac_address
+        self.ip_address = ip_address
+        self.slot = slot
+        self.helper = None  # reused for every call to the radio, so it keeps its token and ACL state
+        self.fields: Optional[Mapping] = None  # every Pancake field of the latest reading
+        self.view: Optional[Mapping] = None  # published mapping, rebuilt only when the reading or trend changes
+        self.trend: Optional[Tuple[int, Optional[int]]] = None  # quantised trend the view was built with
+
+
+def optional_value(value: float) -> Optional[float]:
+    """Read back a value stored with stored_value, None where it was missing."""
+    return None if math.isnan(value) else value
+
+
+def stored_value(value: Optional[float]) -> float:
+    """Value to store in a float field, MISSING for a value the radio did not report."""
+    return MISSING if value is None else value
+
+
+def _quantised(trend: Optional[Tuple[float, Optional[float]]]) -> Optional[Tuple[int, Optional[int]]]:
+    # The time to empty is extrapolated to the publish time, so the raw trend differs on every publish
+    if trend is None:
+        return None
+    return tuple(None if value is None else round(value / TREND_RESOLUTION) for value in trend)
+
+
+class RadioRegistry:
+    """Long-lived store of every known radio and its latest reading.
+
+    Each radio keeps one _Radio record, and with it one reusable helper, for as
+    long as it stays in the topology. Numeric readings live in flat arrays
+    indexed by the radio's slot, so recording a poll overwrites numbers in
+    place, and the mapping published for a radio is only rebuilt after its
+    reading changed or its discharge trend moved by TREND_RESOLUTION. Slots of
+    radios that leave the topology are reused.
+    """
+
+    def __init__(self):
+        self._radios: Dict[str, _Radio] = {}
+        self._free_slots: List[int] = []
+        self._voltage = array('d')
+        self._battery_percentage = array('d')
+        self._input_current = array('d')
+        self._temperature = array('d')
+        self._link_snr = array('d')
+        self._path_throughput = array('d')
+        self._timestamp = array('d')
+        self._columns = (self._voltage, self._battery_percentage, self._input_current, self._temperature,
+                         self._link_snr, self._path_throughput, self._timestamp)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._radios)
+
+    def __contains__(self, mac_address: str) -> bool:
+        return mac_address in self._radios
+
+    def _clear_slot(self, slot: int) -> None:
+        for column in self._columns:
+            column[slot] = MISSING
+
+    def _add(self, mac_address: str, ip_address: str) -> _Radio:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._timestamp)
+            for column in self._columns:
+                column.append(MISSING)
+        radio = self._radios[mac_address] = _Radio(mac_address, ip_address, slot)
+        return radio
+
+    def _remove(self, mac_address: str) -> None:
+        radio = self._radios.pop(mac_address)
+        self._clear_slot(radio.slot)
+        self._free_slots.append(radio.slot)
+
+    def sync(self, stations: Mapping[str, str]) -> None:
+        """Track exactly the given {mac_address: ip_address} radios."""
+        with self._lock:
+            for mac_address in [mac for mac in self._radios if mac not in stations]:
+                self._remove(mac_address)
+            for mac_address, ip_address in stations.items():
+                radio = self._radios.get(mac_address)
+                if radio is None:
+                    self._add(mac_address, ip_address)
+                elif radio.ip_address != ip_address:
+                    radio.ip_address = ip_address
+                    radio.helper = None
+
+    def discard(self, mac_address: str) -> None:
+        """Forget a radio, freeing its slot for reuse."""
+        with self._lock:
+            if mac_address in self._radios:
+                self._remove(mac_address)
+
+    def helper_for(self, mac_address: str, ip_address: str, create: Callable[[str], object]):
+        """Return the radio's helper, creating it with create(ip_address) the first time or after a move."""
+        with self._lock:
+            radio = self._radios.get(mac_address)
+            if radio is None:
+                radio = self._add(mac_address, ip_address)
+            elif radio.ip_address != ip_address:
+                radio.ip_address = ip_address
+                radio.helper = None
+            if radio.helper is None:
+                radio.helper = create(ip_address)
+            return radio.helper
+
+    def record(self, reading: Mapping) -> None:
+        """Store a radio's latest reading in its slot."""
+        with self._lock:
+            radio = self._radios.get(reading['mac_address'])
+            if radio is None:
+                radio = self._add(reading['mac_address'], reading['ip_address'])
+            slot = radio.slot
+            self._voltage[slot] = reading['voltage']
+            self._battery_percentage[slot] = reading['battery_percentage']
+            self._input_current[slot] = stored_value(reading['input_current'])
+            self._temperature[slot] = stored_value(reading['temperature'])
+            self._link_snr[slot] = stored_value(reading['link_snr'])
+            self._path_throughput[slot] = stored_value(reading['path_throughput'])
+            self._timestamp[slot] = reading['timestamp']
+            radio.fields = reading['telemetry']
+            radio.view = None
+
+    def _build_view(self, radio: _Radio, trend: Optional[Tuple[float, Optional[float]]]) -> Mapping:
+        slot = radio.slot
+        discharge_rate, time_to_empty = trend if trend is not None else (None, None)
+        return MappingProxyType({
+            'mac_address': radio.mac_address,
+            'ip_address': radio.ip_address,
+            'voltage': self._voltage[slot],
+            'battery_percentage': self._battery_percentage[slot],
+            'input_current': optional_value(self._input_current[slot]),
+            'temperature': optional_value(self._temperature[slot]),
+            'telemetry': radio.fields,
+            'link_snr': optional_value(self._link_snr[slot]),
+            'path_throughput': optional_value(self._path_throughput[slot]),
+            'timestamp': self._timestamp[slot],
+            'discharge_rate': discharge_rate,
+            'time_to_empty': time_to_empty,
+        })
+
+    def views(self, oldest: float, trends: Mapping[str, Tuple[float, Optional[float]]],
+              exclude_ip: Optional[str] = None) -> Tuple[Mapping, ...]:
+        """Return read-only readings, with their trend, of every radio that reported since oldest."""
+        views = []
+        with self._lock:
+            for mac_address, radio in self._radios.items():
+                timestamp = self._timestamp[radio.slot]
+                # NaN (never reported) fails the comparison as well
+                if not timestamp >= oldest or radio.ip_address == exclude_ip:
+                    continue
+                trend = trends.get(mac_address)
+                quantised = _quantised(trend)
+                if radio.view is None or quantised != radio.trend:
+                    radio.view = self._build_view(radio, trend)
+                    radio.trend = quantised
+                views.append(radio.view)
+        return tuple(views)
@@ -0,0 +1,105 @@
+import errno
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+from metrics import METRICS, PROBE_SECONDS, RADIO_FAILURES
+from transport import UBUS_PORT
+
+PROBE_TIMEOUT = 2  # seconds shared by every probe of a sweep
+REACHABILITY_CACHE_TTL = 5  # seconds a probe result is reused
+MAX_SWEEP_SOCKETS = 256  # connects kept in flight at once to stay well below the fd limit
+
+_CONNECT_PENDING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+class ReachabilitySweeper:
+    """Probes many radios at once with non-blocking TCP connects.
+
+    Up to MAX_SWEEP_SOCKETS connects are driven by a single selector loop under
+    one shared deadline, so such a sweep costs at most one probe timeout however
+    many radios are dead. Results are cached briefly so a radio is probed at most
+    once per poll cycle.
+    """
+
+    def __init__(self, port: int = UBUS_PORT, timeout: float = PROBE_TIMEOUT,
+                 cache_ttl: float = REACHABILITY_CACHE_TTL):
+        self.port = port
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[bool, float]] = {}  # {ip_address: (reachable, probed_at)}
+        self._lock = threading.Lock()
+
+    def _cached(self, ip_address: str, now: float):
+        entry = self._cache.get(ip_address)
+        if entry is not None and now - entry[1] < self.cache_ttl:
+            return entry[0]
+        return None
+
+    def _probe(self, ip_addresses: Iterable[str], deadline: float) -> Dict[str, bool]:
+        results = {}
+        selector = selectors.DefaultSelector()
+        try:
+            for ip_address in ip_addresses:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                try:
+                    result = sock.connect_ex((ip_address, self.port))
+                except OSError:
+                    result = errno.EHOSTUNREACH
+                if result in _CONNECT_PENDING:
+                    selector.register(sock, selectors.EVENT_WRITE, ip_address)
+                else:
+                    results[ip_address] = result == 0
+                    sock.close()
+
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    sock = key.fileobj
+                    results[key.data] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                    selector.unregister(sock)
+                    sock.close()
+
+            # Whatever is still connecting when the deadline passes counts as unreachable
+            for key in list(selector.get_map().values()):
+                results[key.data] = False
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+        finally:
+            selector.close()
+        return results
+
+    def sweep(self, ip_addresses: Iterable[str]) -> Dict[str, bool]:
+        """Check which radios accept a TCP connection, returning {ip_address: reachable}."""
+        now = time.monotonic()
+        results = {}
+        pending = []
+        with self._lock:
+            for ip_address in dict.fromkeys(ip_addresses):
+                cached = self._cached(ip_address, now)
+                if cached is None:
+                    pending.append(ip_address)
+                else:
+                    results[ip_address] = cached
+
+        for start in range(0, len(pending), MAX_SWEEP_SOCKETS):
+            with METRICS.timer(PROBE_SECONDS):
+                probed = self._probe(pending[start:start + MAX_SWEEP_SOCKETS], time.monotonic() + self.timeout)
+            probed_at = time.monotonic()
+            with self._lock:
+                for ip_address, reachable in probed.items():
+                    self._cache[ip_address] = (reachable, probed_at)
+            for ip_address, reachable in probed.items():
+                if not reachable:
+                    METRICS.increment(RADIO_FAILURES, ip_address)
+            results.update(probed)
+        return results
+
+    def is_responsive(self, ip_address: str) -> bool:
+        """Check a single radio, reusing a recent sweep result when there is one."""
+        return self.sweep([ip_address])[ip_address]
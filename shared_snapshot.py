@@ -0,0 +1,208 @@
+"""Fixed-layout radio snapshot in a shared memory buffer, written by one process and read by others.
+
+Layout (little endian):
+
+    control    sequence Q, checksum I, readiness I, heartbeat d
+    header     timestamp d, version Q, radio count I, has local radio I, telemetry length I, padding
+    local      one radio record for the radio the service logs in to
+    telemetry  TELEMETRY_BYTES of JSON holding the local radio's Pancake fields
+    radios     capacity radio records
+
+The writer publishes with a seqlock: it makes the sequence odd, rewrites the
+header and records, stores a CRC32 of them and makes the sequence even again.
+Readers decode straight out of the buffer, never take a lock, and retry when
+the sequence moved or the checksum does not match. The checksum is what keeps
+reads consistent on weakly ordered CPUs (the CORE I/O is arm64), where Python
+code cannot issue memory barriers. Readiness and heartbeat sit outside the
+seqlock and are written on their own.
+"""
+import json
+import struct
+import time
+import zlib
+from types import MappingProxyType
+from typing import Mapping, Optional, Sequence, Tuple
+
+from radio_registry import optional_value, stored_value
+from station_poller import (EMPTY_SNAPSHOT, READINESS_DISCOVERING, READINESS_LOGGING_IN, READINESS_RADIO_UNREACHABLE,
+                            READINESS_READY, READINESS_STARTING, StationSnapshot)
+
+MAX_RADIOS = 1024  # radio records reserved in the buffer; radios beyond it are left out of the snapshot
+TELEMETRY_BYTES = 4096  # room for the local radio's Pancake fields as JSON
+MAX_READ_ATTEMPTS = 64  # consistent reads tried before falling back to the previous snapshot
+NO_HOP_DEPTH = -1  # stored for radios without a known path from the root
+
+# Stored as an index into this tuple; append new states at the end
+READINESS_STATES = (READINESS_STARTING, READINESS_LOGGING_IN, READINESS_RADIO_UNREACHABLE, READINESS_DISCOVERING,
+                    READINESS_READY)
+
+_SEQUENCE = struct.Struct('<Q')
+_CHECKSUM = struct.Struct('<I')
+_READINESS = struct.Struct('<I')
+_HEARTBEAT = struct.Struct('<d')
+_CONTROL = struct.Struct('<QIId')
+_HEADER = struct.Struct('<dQIII4x')
+# mac_address, ip_address, voltage, battery_percentage, input_current, temperature, link_snr, path_throughput,
+# timestamp, discharge_rate, time_to_empty, hop_depth
+_RECORD = struct.Struct('<17s15s9di')
+
+_CHECKSUM_OFFSET = 8
+_READINESS_OFFSET = 12
+_HEARTBEAT_OFFSET = 16
+_HEADER_OFFSET = _CONTROL.size
+_LOCAL_OFFSET = _HEADER_OFFSET + _HEADER.size
+_TELEMETRY_OFFSET = _LOCAL_OFFSET + _RECORD.size
+_RADIOS_OFFSET = _TELEMETRY_OFFSET + TELEMETRY_BYTES
+
+
+def segment_size(capacity: int = MAX_RADIOS) -> int:
+    """Bytes needed for a snapshot of up to capacity radios."""
+    return _RADIOS_OFFSET + capacity * _RECORD.size
+
+
+def _pack_record(buffer, offset: int, reading: Mapping, hop_depth: int) -> None:
+    _RECORD.pack_into(buffer, offset,
+                      (reading['mac_address'] or '').encode('ascii'), reading['ip_address'].encode('ascii'),
+                      reading['voltage'], reading['battery_percentage'], stored_value(reading['input_current']),
+                      stored_value(reading['temperature']), stored_value(reading['link_snr']),
+                      stored_value(reading['path_throughput']), reading['timestamp'],
+                      stored_value(reading.get('discharge_rate')), stored_value(reading.get('time_to_empty')),
+                      hop_depth)
+
+
+def _unpack_record(fields: Tuple, telemetry: Optional[Mapping] = None) -> Mapping:
+    (mac_address, ip_address, voltage, battery_percentage, input_current, temperature, link_snr, path_throughput,
+     timestamp, discharge_rate, time_to_empty, hop_depth) = fields
+    mac_address = mac_address.rstrip(b'\0').decode('ascii')
+    return MappingProxyType({
+        'mac_address': mac_address or None,
+        'ip_address': ip_address.rstrip(b'\0').decode('ascii'),
+        'voltage': voltage,
+        'battery_percentage': battery_percentage,
+        'input_current': optional_value(input_current),
+        'temperature': optional_value(temperature),
+        'telemetry': telemetry,
+        'link_snr': optional_value(link_snr),
+        'path_throughput': optional_value(path_throughput),
+        'timestamp': timestamp,
+        'discharge_rate': optional_value(discharge_rate),
+        'time_to_empty': optional_value(time_to_empty),
+        'hop_depth': None if hop_depth == NO_HOP_DEPTH else hop_depth,
+    })
+
+
+class SnapshotWriter:
+    """Publishes snapshots into a buffer; a buffer must only ever have one writer at a time."""
+
+    def __init__(self, buffer, logger, capacity: int = MAX_RADIOS):
+        if len(buffer) < segment_size(capacity):
+            raise ValueError(f"Buffer of {len(buffer)} bytes cannot hold {capacity} radios")
+        self.buffer = buffer
+        self.logger = logger
+        self.capacity = capacity
+        self._truncated = False
+        self._telemetry_dropped = False
+
+    def _encode_telemetry(self, local_station: Optional[Mapping]) -> bytes:
+        if local_station is None or not local_station['telemetry']:
+            return b''
+        encoded = json.dumps(dict(local_station['telemetry']), separators=(',', ':')).encode('utf-8')
+        if len(encoded) > TELEMETRY_BYTES:
+            if not self._telemetry_dropped:
+                self._telemetry_dropped = True
+                self.logger.warning(f"Local Pancake telemetry is {len(encoded)} bytes, more than the "
+                                    f"{TELEMETRY_BYTES} reserved; publishing readings without it")
+            return b''
+        return encoded
+
+    def write(self, snapshot: StationSnapshot, hop_depths: Mapping[str, int]) -> None:
+        """Publish a snapshot, with each radio's hop depth from the root."""
+        stations: Sequence[Mapping] = snapshot.stations
+        if len(stations) > self.capacity:
+            if not self._truncated:
+                self._truncated = True
+                self.logger.warning(f"{len(stations)} radios exceed the {self.capacity} shared snapshot records; "
+                                    f"the rest are left out")
+            stations = stations[:self.capacity]
+        telemetry = self._encode_telemetry(snapshot.local_station)
+        buffer = self.buffer
+
+        sequence = _SEQUENCE.unpack_from(buffer, 0)[0] | 1
+        _SEQUENCE.pack_into(buffer, 0, sequence)
+        _HEADER.pack_into(buffer, _HEADER_OFFSET, stored_value(snapshot.timestamp), snapshot.version, len(stations),
+                          snapshot.local_station is not None, len(telemetry))
+        if snapshot.local_station is not None:
+            _pack_record(buffer, _LOCAL_OFFSET, snapshot.local_station, 0)
+        buffer[_TELEMETRY_OFFSET:_TELEMETRY_OFFSET + len(telemetry)] = telemetry
+        offset = _RADIOS_OFFSET
+        for station in stations:
+            _pack_record(buffer, offset, station, hop_depths.get(station['mac_address'], NO_HOP_DEPTH))
+            offset += _RECORD.size
+        _CHECKSUM.pack_into(buffer, _CHECKSUM_OFFSET, zlib.crc32(buffer[_HEADER_OFFSET:offset]))
+        _SEQUENCE.pack_into(buffer, 0, sequence + 1)
+
+    def version(self) -> int:
+        """Version of the snapshot last published in the buffer, so a new writer can carry on from it."""
+        return _HEADER.unpack_from(self.buffer, _HEADER_OFFSET)[1]
+
+    def set_readiness(self, readiness: str) -> None:
+        _READINESS.pack_into(self.buffer, _READINESS_OFFSET, READINESS_STATES.index(readiness))
+
+    def beat(self) -> None:
+        """Record that the writer is alive, on the system-wide monotonic clock."""
+        _HEARTBEAT.pack_into(self.buffer, _HEARTBEAT_OFFSET, time.monotonic())
+
+
+class SnapshotReader:
+    """Decodes the snapshot published in a buffer, at most once per publish.
+
+    Safe to share between threads without a lock: the latest decoded snapshot
+    is replaced with a single assignment, and a race only costs a second decode.
+    """
+
+    def __init__(self, buffer, capacity: int = MAX_RADIOS):
+        self.buffer = buffer
+        self.capacity = capacity
+        self._latest: Tuple[int, StationSnapshot] = (0, EMPTY_SNAPSHOT)  # (sequence, snapshot decoded at it)
+
+    def _decode(self, sequence: int) -> Optional[StationSnapshot]:
+        buffer = self.buffer
+        timestamp, version, count, has_local, telemetry_length = _HEADER.unpack_from(buffer, _HEADER_OFFSET)
+        if count > self.capacity or telemetry_length > TELEMETRY_BYTES:
+            return None  # torn header
+        end = _RADIOS_OFFSET + count * _RECORD.size
+        if zlib.crc32(buffer[_HEADER_OFFSET:end]) != _CHECKSUM.unpack_from(buffer, _CHECKSUM_OFFSET)[0]:
+            return None
+        local_station = None
+        if has_local:
+            telemetry = None
+            if telemetry_length:
+                telemetry = MappingProxyType(json.loads(
+                    bytes(buffer[_TELEMETRY_OFFSET:_TELEMETRY_OFFSET + telemetry_length]).decode('utf-8')))
+            local_station = _unpack_record(_RECORD.unpack_from(buffer, _LOCAL_OFFSET), telemetry)
+        stations = tuple(_unpack_record(fields) for fields in _RECORD.iter_unpack(buffer[_RADIOS_OFFSET:end]))
+        return StationSnapshot(version, optional_value(timestamp), stations, local_station)
+
+    def read(self) -> StationSnapshot:
+        """Return the latest published snapshot, or the previous one while the writer is mid-update."""
+        latest_sequence, latest = self._latest
+        for _ in range(MAX_READ_ATTEMPTS):
+            sequence = _SEQUENCE.unpack_from(self.buffer, 0)[0]
+            if sequence == latest_sequence:
+                return latest
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            snapshot = self._decode(sequence)
+            if snapshot is not None and _SEQUENCE.unpack_from(self.buffer, 0)[0] == sequence:
+                self._latest = (sequence, snapshot)
+                return snapshot
+        return latest
+
+    def readiness(self) -> str:
+        index = _READINESS.unpack_from(self.buffer, _READINESS_OFFSET)[0]
+        return READINESS_STATES[index] if index < len(READINESS_STATES) else READINESS_STARTING
+
+    def heartbeat(self) -> float:
+        """Monotonic time of the writer's last heartbeat, 0 if it never beat."""
+        return _HEARTBEAT.unpack_from(self.buffer, _HEARTBEAT_OFFSET)[0]
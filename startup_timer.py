@@ -0,0 +1,40 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """Records how long each startup phase takes so cold-start time can be tracked.
+
+    Phases may run concurrently on different threads; each one is recorded with
+    its own duration and the time it finished relative to process start.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.started = time.monotonic()
+        self.phases: List[Tuple[str, float, float]] = []  # (name, duration, finished_at)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float) -> None:
+        """Record a phase that just finished after running for duration seconds."""
+        finished_at = time.monotonic() - self.started
+        with self._lock:
+            self.phases.append((name, duration, finished_at))
+        self.logger.info(f"Startup phase '{name}' took {duration:.2f}s (done at +{finished_at:.2f}s)")
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as a startup phase."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def log_summary(self, milestone: str) -> None:
+        """Log every phase recorded so far and the time elapsed until milestone."""
+        with self._lock:
+            breakdown = ', '.join(f"{name} {duration:.2f}s" for name, duration, _ in self.phases)
+        self.logger.info(f"{milestone} after {time.monotonic() - self.started:.2f}s ({breakdown})")
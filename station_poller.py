@@ -0,0 +1,264 @@
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from async_doodle_helper import MAX_CONCURRENCY, AsyncPollingBackend
+from doodle_helper import DoodleHelper, PancakeTelemetry, StationDiscovery
+from metrics import METRICS, OPEN_CIRCUITS, POLL_CYCLE_SECONDS, SNAPSHOT_AGE
+from poll_scheduler import FAILURE_BACKOFF, MAX_POLL_INTERVAL, PollScheduler
+from reachability import ReachabilitySweeper
+from startup_timer import StartupTimer
+from transport import RadioTransport
+from voltage_history import VoltageHistory
+
+POLL_BACKENDS = ('threaded', 'asyncio')
+DEFAULT_POLL_BACKEND = 'threaded'
+DEFAULT_POLL_INTERVAL = 1.0  # seconds between the start of two poll cycles
+DEFAULT_MAX_SNAPSHOT_AGE = 10.0  # seconds after which a snapshot is considered stale
+MAX_READING_AGE = 2 * MAX_POLL_INTERVAL  # seconds a radio's last reading is served while it is not answering
+MAX_LOGIN_BACKOFF = MAX_POLL_INTERVAL  # seconds; longest wait between two logins to an unreachable root radio
+
+# Readiness states reported while the poller brings the radio mesh up
+READINESS_STARTING = 'starting'
+READINESS_LOGGING_IN = 'logging in'
+READINESS_RADIO_UNREACHABLE = 'radio unreachable'
+READINESS_DISCOVERING = 'discovering'
+READINESS_READY = 'ready'
+
+
+class StationSnapshot(NamedTuple):
+    """Immutable, versioned view of the latest radio readings."""
+    version: int  # raised only when a reading changed, so equal versions carry equal readings
+    timestamp: Optional[float]  # wall-clock time the snapshot was published, refreshed on every publish
+    stations: Tuple[Mapping, ...]  # remote radios, local radio excluded
+    local_station: Optional[Mapping]  # reading of the radio the service logs in to
+
+    def age(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds elapsed since the snapshot was published, or None if it never was."""
+        if self.timestamp is None:
+            return None
+        return (time.time() if now is None else now) - self.timestamp
+
+
+EMPTY_SNAPSHOT = StationSnapshot(0, None, (), None)
+
+
+def _same_local_reading(reading: Optional[Mapping], previous: Optional[Mapping]) -> bool:
+    """Check if two readings of the local radio only differ in when they were taken."""
+    if reading is None or previous is None:
+        return reading is previous
+    return all(value == previous.get(key) for key, value in reading.items() if key != 'timestamp')
+
+
+class SnapshotSource:
+    """Staleness checks shared by the pollers, on top of their get_snapshot() and max_snapshot_age."""
+
+    max_snapshot_age: float
+
+    def get_snapshot(self) -> StationSnapshot:
+        raise NotImplementedError
+
+    def is_stale(self, snapshot: StationSnapshot) -> bool:
+        """Check if a snapshot is missing or older than the staleness limit."""
+        age = snapshot.age()
+        return age is None or age > self.max_snapshot_age
+
+    def get_fresh_snapshot(self) -> StationSnapshot:
+        """Return the latest snapshot, or an empty one if it is stale."""
+        snapshot = self.get_snapshot()
+        if self.is_stale(snapshot):
+            return EMPTY_SNAPSHOT
+        return snapshot
+
+
+class StationPoller(SnapshotSource):
+    """Background thread that owns station discovery and publishes reading snapshots.
+
+    Readers never block on the mesh: they only dereference the latest published
+    snapshot, which is replaced atomically at the end of each poll cycle. Each
+    cycle only polls the radios the PollScheduler reports as due; the others
+    keep their latest reading, held in the discovery's RadioRegistry, until it
+    is MAX_READING_AGE old.
+    """
+
+    def __init__(self, root_station: DoodleHelper, logger,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_snapshot_age: float = DEFAULT_MAX_SNAPSHOT_AGE,
+                 backend: str = DEFAULT_POLL_BACKEND, max_concurrency: int = MAX_CONCURRENCY,
+                 topology_cache_path: Optional[str] = None, startup_timer: Optional[StartupTimer] = None,
+                 transport: Optional[RadioTransport] = None, reachability: Optional[ReachabilitySweeper] = None):
+        if backend not in POLL_BACKENDS:
+            raise ValueError(f"Unknown poll backend '{backend}', expected one of {POLL_BACKENDS}")
+        self.root_station = root_station
+        self.logger = logger
+        self.poll_interval = poll_interval
+        self.max_snapshot_age = max_snapshot_age
+        self.station_discovery = StationDiscovery(logger, transport=transport, reachability=reachability)
+        self.topology_cache_path = topology_cache_path
+        if topology_cache_path:
+            self.station_discovery.load_topology(topology_cache_path)
+        if root_station.session_registry is None:
+            root_station.session_registry = self.station_discovery.session_registry
+        # Both backends expose get_station_voltages(root_station)
+        if backend == 'asyncio':
+            self.backend = AsyncPollingBackend(self.station_discovery, logger, max_concurrency=max_concurrency)
+        else:
+            self.backend = self.station_discovery
+        self.voltage_history = VoltageHistory()
+        self.scheduler = PollScheduler()
+        self.readiness = READINESS_STARTING
+        self.startup_timer = startup_timer
+        self._warm_up_started = time.monotonic()  # moved to the end of the radio login once it succeeds
+        self._logged_in_once = False
+        self._login_failures = 0
+        self._next_login = 0.0  # monotonic time before which a failed root login is not retried
+        self._snapshot = EMPTY_SNAPSHOT
+        METRICS.register_gauge(SNAPSHOT_AGE, lambda: self._snapshot.age())
+        METRICS.register_gauge(OPEN_CIRCUITS, self.scheduler.open_circuits)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the polling thread if it is not already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='station-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the polling thread to exit and wait for it."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self) -> None:
+        """Stop polling and release the asyncio backend's event loop and radio connections, if it has one."""
+        self.stop()
+        if self.backend is not self.station_discovery:
+            self.backend.close()
+
+    def get_snapshot(self) -> StationSnapshot:
+        """Return the latest published snapshot, whatever its age."""
+        return self._snapshot
+
+    def hop_depths(self) -> Mapping[str, int]:
+        """{mac_address: hops from the root radio} of every discovered radio."""
+        return self.station_discovery.station_depth
+
+    def build_local_reading(self, telemetry: PancakeTelemetry) -> Dict:
+        """Build the reading of the local radio from telemetry read outside the poll cycle."""
+        return self.station_discovery._build_reading(None, self.root_station.host_ip, telemetry.voltage, telemetry)
+
+    def _publish(self, readings: List[Dict], local_station: Optional[Mapping]) -> StationSnapshot:
+        """Merge fresh readings into the latest ones and publish them as a new snapshot."""
+        now = time.time()
+        self.voltage_history.record_readings(readings)
+        self.voltage_history.retain(self.station_discovery.discovered_stations)
+        trends = self.voltage_history.discharge_trends(now)
+
+        radios = self.station_discovery.radios
+        for reading in readings:
+            if reading['mac_address'] in self.station_discovery.discovered_stations:
+                radios.record(reading)
+        # Only radios polled since the last publish, or whose trend moved, get a new mapping
+        stations = radios.views(now - MAX_READING_AGE, trends, exclude_ip=self.root_station.host_ip)
+
+        previous = self._snapshot
+        changed = (len(stations) != len(previous.stations)
+                   or any(view is not old for view, old in zip(stations, previous.stations))
+                   or not _same_local_reading(local_station, previous.local_station))
+        version = previous.version + 1 if changed else previous.version
+        snapshot = StationSnapshot(version, now, stations, local_station)
+        self._snapshot = snapshot
+        return snapshot
+
+    def _reschedule(self, polled: Iterable[str], readings: List[Dict]) -> None:
+        """Report each polled radio's outcome to the scheduler, failing those that returned no reading."""
+        trends = self.voltage_history.discharge_trends(time.time())
+        answered = set()
+        for reading in readings:
+            mac_address = reading['mac_address']
+            answered.add(mac_address)
+            discharge_rate = trends[mac_address][0] if mac_address in trends else None
+            self.scheduler.record_success(mac_address, reading['battery_percentage'], discharge_rate)
+        for mac_address in polled:
+            if mac_address not in answered:
+                self.scheduler.record_failure(mac_address)
+
+    def poll_once(self) -> StationSnapshot:
+        """Run one poll cycle, then refresh the topology if it is due, publishing after each step.
+
+        Known radios are polled before the topology is touched, so a refresh (or
+        the revalidation of a topology restored from disk) never delays readings.
+        """
+        if self.root_station.token is None:
+            if time.monotonic() < self._next_login:
+                return self._snapshot
+            self.readiness = READINESS_LOGGING_IN
+            started = time.monotonic()
+            if not self.root_station.login():
+                # Back off like a failing radio, so a root radio that is down is not hammered every poll interval
+                self._login_failures += 1
+                backoff = min(MAX_LOGIN_BACKOFF, FAILURE_BACKOFF * 2 ** min(self._login_failures - 1, 16))
+                self._next_login = time.monotonic() + backoff
+                if self._login_failures == 1:
+                    self.logger.warning(f"Root radio {self.root_station.host_ip} unreachable, retrying the login "
+                                        f"with up to {MAX_LOGIN_BACKOFF:.0f}s between attempts")
+                self.readiness = READINESS_RADIO_UNREACHABLE
+                return self._snapshot
+            if self._login_failures:
+                self.logger.info(f"Logged in to root radio {self.root_station.host_ip} after "
+                                 f"{self._login_failures} failed attempts")
+                self._login_failures = 0
+            if not self._logged_in_once:
+                self._logged_in_once = True
+                self._warm_up_started = time.monotonic()
+                if self.startup_timer is not None:
+                    self.startup_timer.record('radio login', self._warm_up_started - started)
+
+        if self.station_discovery.last_discovery is None:
+            self.readiness = READINESS_DISCOVERING
+        self.scheduler.sync(self.station_discovery.discovered_stations)
+        due = self.scheduler.due()
+        skip = set(self.station_discovery.discovered_stations).difference(due)
+        readings = self.backend.get_station_voltages(self.root_station, skip=skip)
+
+        local_station = None
+        telemetry = self.root_station.get_telemetry()
+        if telemetry is not None and telemetry.voltage is not None:
+            local_station = MappingProxyType(
+                self.station_discovery._build_reading(None, self.root_station.host_ip, telemetry.voltage, telemetry))
+
+        snapshot = self._publish(readings, local_station)
+        self._reschedule(due, readings)
+
+        if self.station_discovery.should_update_cache():
+            # Radios explored during the update return a voltage alongside their association list
+            polled = {reading['mac_address'] for reading in readings}
+            explored = [reading for reading in self.station_discovery.update_station_cache(self.root_station)
+                        if reading['mac_address'] not in polled]
+            if self.topology_cache_path:
+                self.station_discovery.save_topology(self.topology_cache_path)
+            snapshot = self._publish(explored, local_station)
+            self.scheduler.sync(self.station_discovery.discovered_stations)
+            self._reschedule((), explored)
+
+        if self.readiness != READINESS_READY:
+            self.readiness = READINESS_READY
+            if self.startup_timer is not None:
+                self.startup_timer.record('topology warm-up', time.monotonic() - self._warm_up_started)
+                self.startup_timer.log_summary('Radio mesh ready')
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.logger.error(f"Error polling radios: {str(e)}")
+            elapsed = time.monotonic() - started
+            METRICS.observe(POLL_CYCLE_SECONDS, elapsed)
+            self._stop_event.wait(max(0.0, self.poll_interval - elapsed))
@@ -0,0 +1,92 @@
+import json
+import logging
+import threading
+import time
+import unittest
+
+from doodle_battery_service import DoodleBatteryAdapter
+from doodle_helper import ANONYMOUS_SESSION, JSONRPC_ACCESS_DENIED, PANCAKE_VOLTAGE_KEY
+
+HOST_IP = "192.0.2.1"
+PANCAKE = json.dumps({PANCAKE_VOLTAGE_KEY: "484.8"})
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeRadioTransport:
+    """Answers ubus calls like a single radio with no neighbours, recording the sessions it hands out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = []
+        self.call_tokens = []
+
+    def _answer(self, request):
+        token, ubus_object, method, _ = request['params']
+        if (ubus_object, method) == ("session", "login"):
+            with self._lock:
+                session = f"session-{len(self.sessions) + 1}"
+                self.sessions.append(session)
+            return {"jsonrpc": "2.0", "id": request['id'],
+                    "result": [0, {"ubus_rpc_session": session, "expires": 300}]}
+        if token == ANONYMOUS_SESSION or token not in self.sessions:
+            return {"jsonrpc": "2.0", "id": request['id'],
+                    "error": {"code": JSONRPC_ACCESS_DENIED, "message": "Access denied"}}
+        with self._lock:
+            self.call_tokens.append(token)
+        if (ubus_object, method) == ("file", "read"):
+            return {"jsonrpc": "2.0", "id": request['id'], "result": [0, {"data": PANCAKE}]}
+        if (ubus_object, method) == ("iwinfo", "assoclist"):
+            return {"jsonrpc": "2.0", "id": request['id'], "result": [0, {"results": []}]}
+        return {"jsonrpc": "2.0", "id": request['id'], "result": [0, {}]}
+
+    def post(self, url, payload, timeout):
+        if isinstance(payload, list):
+            return _Response([self._answer(request) for request in payload])
+        return _Response(self._answer(payload))
+
+
+class UnreachableSweeper:
+    """Reports every radio as down, so the poller never crawls past the root."""
+
+    def sweep(self, ip_addresses):
+        return {ip_address: False for ip_address in ip_addresses}
+
+    def is_responsive(self, ip_address):
+        return False
+
+
+class LiveReadTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeRadioTransport()
+        # A zero capture age makes every read go to the radio instead of the polled reading
+        self.adapter = DoodleBatteryAdapter(HOST_IP, "configurator", "test", max_capture_age=0,
+                                            transport=self.transport, reachability=UnreachableSweeper())
+
+    def tearDown(self):
+        self.adapter.poller.close()
+
+    def test_live_read_reuses_poller_session(self):
+        deadline = time.monotonic() + 5
+        while self.adapter.poller.root_station.token is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        poller_token = self.adapter.poller.root_station.token
+        self.assertIsNotNone(poller_token)
+
+        reading, source = self.adapter._read_local_station()
+
+        self.assertEqual(source, 'live')
+        self.assertAlmostEqual(reading['voltage'], 24.0)
+        self.assertEqual(self.adapter.doodle_helper.token, poller_token)
+        self.assertEqual(self.transport.sessions, [poller_token])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()
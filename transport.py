@@ -0,0 +1,175 @@
+import ssl
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+from metrics import METRICS, TLS_HANDSHAKES, TLS_RESUMPTIONS
+
+UBUS_PORT = 443  # radios serve ubus over HTTPS
+POOL_HOSTS = 512  # radios whose connection pools are kept before the least recently used is dropped
+POOL_SIZE_PER_HOST = 2  # keep-alive connections per radio; the poller and a live read may overlap
+CONNECT_RETRIES = 1  # a refused or reset connect is retried once; requests that reached a radio never are
+RETRY_BACKOFF = 0.1  # seconds before the connect retry
+
+
+class _SessionKeepingSocket(ssl.SSLSocket):
+    """SSLSocket that hands its TLS session back to its context after its first read and when closed.
+
+    TLS 1.3 session tickets arrive after the handshake, so the session is only
+    complete once some data has been read. Pooled connections stay open for a
+    long time, so waiting for the close would leave other connections to the
+    radio, such as the asyncio backend's, without a session to resume.
+    """
+
+    def recv_into(self, buffer, nbytes=None, flags=0):
+        received = super().recv_into(buffer, nbytes, flags)
+        peer = getattr(self, 'resume_peer', None)
+        if peer is not None and received and not getattr(self, 'session_kept', False):
+            self.session_kept = True
+            self.context.remember_session(peer, self.session)
+        return received
+
+    def close(self):
+        peer = getattr(self, 'resume_peer', None)
+        if peer is not None:
+            try:
+                self.context.remember_session(peer, self.session)
+            except (OSError, ValueError):
+                pass
+        super().close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSLContext that resumes the previous TLS session of each radio.
+
+    Radios have weak CPUs, so a resumed handshake (no key exchange) is much
+    cheaper for them than a full one. The last session negotiated with every
+    radio IP is offered on the next connection to it, and every handshake is
+    counted, per radio, as full or resumed. Sockets opened by requests and
+    asyncio connections, which go through wrap_bio, share the same sessions.
+    """
+
+    sslsocket_class = _SessionKeepingSocket
+
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        return super().__new__(cls, protocol, *args, **kwargs)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._sessions: Dict[str, ssl.SSLSession] = {}  # {radio ip: last session}
+        self._session_lock = threading.Lock()
+        self.handshakes = 0
+        self.resumptions = 0
+
+    def _session_for(self, peer: str) -> Optional[ssl.SSLSession]:
+        with self._session_lock:
+            return self._sessions.get(peer)
+
+    def remember_session(self, peer: str, session: Optional[ssl.SSLSession]) -> None:
+        if session is not None:
+            with self._session_lock:
+                self._sessions[peer] = session
+
+    def forget_session(self, peer: str) -> None:
+        """Drop a session the radio choked on, so the next connect does a full handshake."""
+        with self._session_lock:
+            self._sessions.pop(peer, None)
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True, suppress_ragged_eofs=True,
+                    server_hostname=None, session=None):
+        try:
+            peer = sock.getpeername()[0]
+        except OSError:
+            peer = None
+        if session is None and peer is not None and not server_side:
+            session = self._session_for(peer)
+        try:
+            ssl_socket = super().wrap_socket(sock, server_side=server_side,
+                                             do_handshake_on_connect=do_handshake_on_connect,
+                                             suppress_ragged_eofs=suppress_ragged_eofs,
+                                             server_hostname=server_hostname, session=session)
+        except ssl.SSLError:
+            if session is not None:
+                # The connect retry then does a full handshake
+                self.forget_session(peer)
+            raise
+
+        if peer is not None and not server_side:
+            ssl_socket.resume_peer = peer
+            if do_handshake_on_connect:
+                self.record_handshake(peer, ssl_socket)
+        return ssl_socket
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        # asyncio wraps a memory BIO before the handshake and passes the radio IP it connects to as server_hostname;
+        # the caller records the handshake and hands the session back, since no socket is closed here
+        if session is None and server_hostname is not None and not server_side:
+            session = self._session_for(server_hostname)
+        return super().wrap_bio(incoming, outgoing, server_side=server_side, server_hostname=server_hostname,
+                                session=session)
+
+    def record_handshake(self, peer: str, ssl_object: Union[ssl.SSLSocket, ssl.SSLObject]) -> None:
+        """Count a completed handshake with a radio and keep its session for the next connection."""
+        resumed = ssl_object.session_reused
+        with self._session_lock:
+            self.handshakes += 1
+            self.resumptions += resumed
+            if ssl_object.session is not None:
+                self._sessions[peer] = ssl_object.session
+        METRICS.increment(TLS_RESUMPTIONS if resumed else TLS_HANDSHAKES, peer)
+
+
+def insecure_ssl_context() -> ResumingSSLContext:
+    """Radios use self-signed certificates, so verification is disabled."""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class _RadioAdapter(HTTPAdapter):
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+
+class RadioTransport:
+    """Process-wide HTTPS transport every radio RPC goes through.
+
+    One requests.Session keeps a keep-alive pool per radio, so steady-state
+    polling reuses warm connections, and new connections resume the radio's
+    previous TLS session. Only connects are retried, since a ubus call that
+    reached the radio may already have taken effect.
+    """
+
+    def __init__(self, pool_hosts: int = POOL_HOSTS, pool_size: int = POOL_SIZE_PER_HOST,
+                 connect_retries: int = CONNECT_RETRIES):
+        self.ssl_context = insecure_ssl_context()
+        retry = Retry(total=connect_retries, connect=connect_retries, read=0, redirect=0, status=0, other=0,
+                      backoff_factor=RETRY_BACKOFF, raise_on_status=False)
+        self.session = requests.Session()
+        self.session.verify = False
+        # Radios sit on the local mesh: skip proxy and netrc lookups on every request
+        self.session.trust_env = False
+        self.session.mount('https://', _RadioAdapter(self.ssl_context, pool_connections=pool_hosts,
+                                                     pool_maxsize=pool_size, max_retries=retry))
+
+    def post(self, url: str, payload: Union[Dict, list], timeout: float) -> requests.Response:
+        return self.session.post(url, json=payload, timeout=timeout)
+
+    def handshake_counts(self) -> Tuple[int, int]:
+        """Return (total, resumed) TLS handshakes made so far."""
+        return self.ssl_context.handshakes, self.ssl_context.resumptions
+
+    def close(self) -> None:
+        self.session.close()
+
+
+SHARED_TRANSPORT = RadioTransport()  # used by every DoodleHelper unless one is given explicitly
@@ -0,0 +1,374 @@
+"""Record ubus traffic to a trace file and replay it offline.
+
+Recording wraps the radio transport and the reachability sweeper, so every
+ubus request, its response (or failure) and its round-trip time, plus every
+reachability probe, lands in a gzip-compressed JSON Lines trace:
+
+    python doodle_battery_service.py ... --record-trace field.trace.gz
+    python mesh_scan.py 10.223.68.37 --username configurator --record-trace survey.trace.gz
+
+Replaying feeds the trace back to DoodleHelper and StationDiscovery, with the
+recorded latencies scaled by --latency-scale, and reports how long discovery
+and each poll took, so field sessions can be profiled on a desk:
+
+    python ubus_trace.py field.trace.gz --polls 5 --latency-scale 1.0 --profile
+"""
+import gzip
+import json
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from doodle_helper import ANONYMOUS_SESSION, UBUS_PORT, DoodleHelper, StationDiscovery
+from reachability import ReachabilitySweeper
+from transport import SHARED_TRANSPORT, RadioTransport
+
+TRACE_VERSION = 1  # bump when the event layout changes
+FLUSH_EVERY = 256  # events written between flushes, so a killed recorder still leaves a readable trace
+REDACTED = '<redacted>'
+
+ERROR_TIMEOUT = 'timeout'
+ERROR_CONNECTION = 'connection'
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).hostname
+
+
+def _calls(payload: Union[Dict, List[Dict]]) -> List[Dict]:
+    return payload if isinstance(payload, list) else [payload]
+
+
+def _signature(call: Dict) -> Tuple[str, str]:
+    """(ubus object, method) of a JSON-RPC call, which is what replayed responses are matched on."""
+    params = call.get('params') or [None, None, None]
+    return params[1], params[2]
+
+
+class TraceRecorder:
+    """Appends ubus exchanges and reachability probes to a trace file from any thread.
+
+    Login passwords are redacted, and every ubus session token is replaced by
+    a stable placeholder, so a trace copied off a field system holds no live
+    credentials. Replay never needs the real tokens.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._started = time.monotonic()
+        self._unflushed = 0
+        self._lock = threading.Lock()
+        self._placeholders: Dict[str, str] = {ANONYMOUS_SESSION: ANONYMOUS_SESSION}  # {token: placeholder}
+        self._placeholders_lock = threading.Lock()
+        self._write({'trace': 'ubus', 'version': TRACE_VERSION, 'started': time.time()})
+
+    def _write(self, event: Dict) -> None:
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._unflushed += 1
+            if self._unflushed >= FLUSH_EVERY:
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+                self._unflushed = 0
+
+    def _placeholder(self, token: str) -> str:
+        """Stand-in for a session token, the same one every time the token appears."""
+        if not isinstance(token, str):
+            return token
+        with self._placeholders_lock:
+            placeholder = self._placeholders.get(token)
+            if placeholder is None:
+                # Shaped like a token; the anonymous session is all zeros, so numbering starts at 1
+                placeholder = self._placeholders[token] = f"{len(self._placeholders):032x}"
+            return placeholder
+
+    def _redacted_call(self, call: Dict) -> Dict:
+        params = call.get('params')
+        if not isinstance(params, list) or len(params) != 4:
+            return call
+        token, ubus_object, method, arguments = params
+        if (ubus_object, method) == ('session', 'login') and isinstance(arguments, dict):
+            arguments = {**arguments, 'password': REDACTED}
+        return {**call, 'params': [self._placeholder(token), ubus_object, method, arguments]}
+
+    def _redacted_response(self, response):
+        result = response.get('result') if isinstance(response, dict) else None
+        if not isinstance(result, list) or len(result) < 2 or not isinstance(result[1], dict) \
+                or 'ubus_rpc_session' not in result[1]:
+            return response
+        session = {**result[1], 'ubus_rpc_session': self._placeholder(result[1]['ubus_rpc_session'])}
+        return {**response, 'result': [result[0], session, *result[2:]]}
+
+    def _redacted(self, payload: Union[Dict, List[Dict]], response) -> Tuple[Union[Dict, List[Dict]], object]:
+        """Copies of a request and its response with passwords and session tokens replaced."""
+        if isinstance(payload, list):
+            payload = [self._redacted_call(call) for call in payload]
+        else:
+            payload = self._redacted_call(payload)
+        if isinstance(response, list):
+            response = [self._redacted_response(item) for item in response]
+        else:
+            response = self._redacted_response(response)
+        return payload, response
+
+    def _offset(self) -> float:
+        return round(time.monotonic() - self._started, 6)
+
+    def record_exchange(self, host_ip: str, payload: Union[Dict, List[Dict]], response, error: Optional[str],
+                        rtt: float) -> None:
+        payload, response = self._redacted(payload, response)
+        self._write({'t': self._offset(), 'ip': host_ip, 'req': payload, 'res': response,
+                     'err': error, 'rtt': round(rtt, 6)})
+
+    def record_probe(self, results: Dict[str, bool], rtt: float) -> None:
+        self._write({'t': self._offset(), 'probe': results, 'rtt': round(rtt, 6)})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_trace(path: str) -> Tuple[Dict, List[Dict]]:
+    """Read a trace, returning (header, events); a trace cut short by a crash yields what was flushed."""
+    events = []
+    with gzip.open(path, 'rt', encoding='utf-8') as trace_file:
+        try:
+            for line in trace_file:
+                if line.endswith('\n'):
+                    events.append(json.loads(line))
+        except EOFError:
+            pass
+    if not events or events[0].get('trace') != 'ubus':
+        raise ValueError(f"{path} is not a ubus trace")
+    header = events.pop(0)
+    if header.get('version') != TRACE_VERSION:
+        raise ValueError(f"{path} has trace version {header.get('version')}, expected {TRACE_VERSION}")
+    return header, events
+
+
+class _RecordedResponse:
+    """Stand-in for a requests.Response holding already decoded JSON."""
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class RecordingTransport:
+    """Radio transport that records every request it forwards."""
+
+    def __init__(self, recorder: TraceRecorder, transport: RadioTransport = SHARED_TRANSPORT):
+        self.recorder = recorder
+        self.transport = transport
+
+    def post(self, url: str, payload: Union[Dict, list], timeout: float):
+        host_ip = _host(url)
+        started = time.perf_counter()
+        try:
+            response = self.transport.post(url, payload, timeout)
+            data = response.json()
+        except requests.Timeout:
+            self.recorder.record_exchange(host_ip, payload, None, ERROR_TIMEOUT, time.perf_counter() - started)
+            raise
+        except (requests.ConnectionError, ValueError):
+            self.recorder.record_exchange(host_ip, payload, None, ERROR_CONNECTION, time.perf_counter() - started)
+            raise
+        self.recorder.record_exchange(host_ip, payload, data, None, time.perf_counter() - started)
+        return _RecordedResponse(data)
+
+    def handshake_counts(self) -> Tuple[int, int]:
+        return self.transport.handshake_counts()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class RecordingReachability(ReachabilitySweeper):
+    """Reachability sweeper that records the outcome of every probe batch."""
+
+    def __init__(self, recorder: TraceRecorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def _probe(self, ip_addresses: Iterable[str], deadline: float) -> Dict[str, bool]:
+        started = time.perf_counter()
+        results = super()._probe(ip_addresses, deadline)
+        self.recorder.record_probe(results, time.perf_counter() - started)
+        return results
+
+
+def _next(recorded: Deque):
+    """Pop the next recorded entry, keeping the last one so a replay may outlast its trace."""
+    return recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+
+class ReplayTransport:
+    """Radio transport answering from a trace instead of the network.
+
+    Responses are matched per radio and per (ubus object, method) in recorded
+    order, call by call, so a replay still works when the code under test
+    batches calls differently from the code that recorded the trace. Each
+    request sleeps for its recorded round-trip time times latency_scale, and
+    times out if that exceeds the timeout it was given.
+    """
+
+    def __init__(self, events: Iterable[Dict], latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        # {(ip_address, (object, method)): deque of (response or None, error, rtt)}
+        self._recorded: Dict[Tuple[str, Tuple[str, str]], Deque] = {}
+        self._lock = threading.Lock()
+        self.hosts = set()
+        for event in events:
+            if 'ip' not in event:
+                continue
+            self.hosts.add(event['ip'])
+            calls = _calls(event['req'])
+            if event['err'] is not None:
+                responses = [None] * len(calls)
+            elif isinstance(event['res'], list):
+                by_id = {response.get('id'): response for response in event['res']}
+                responses = [by_id.get(call.get('id')) for call in calls]
+            else:
+                responses = [event['res']]
+            for call, response in zip(calls, responses):
+                key = (event['ip'], _signature(call))
+                error = event['err'] if response is not None or event['err'] else ERROR_CONNECTION
+                self._recorded.setdefault(key, deque()).append((response, error, event['rtt']))
+
+    def post(self, url: str, payload: Union[Dict, list], timeout: float):
+        host_ip = _host(url)
+        calls = _calls(payload)
+        with self._lock:
+            recorded = [self._recorded.get((host_ip, _signature(call))) for call in calls]
+            replies = [_next(entries) if entries else None for entries in recorded]
+
+        latency = max((reply[2] for reply in replies if reply is not None), default=0.0) * self.latency_scale
+        if any(reply is None or reply[1] == ERROR_CONNECTION for reply in replies):
+            time.sleep(min(latency, timeout))
+            raise requests.ConnectionError(f"No recorded response from {host_ip}")
+        if latency > timeout or any(reply[1] == ERROR_TIMEOUT for reply in replies):
+            time.sleep(min(latency, timeout))
+            raise requests.Timeout(f"Replayed request to {host_ip} timed out after {timeout}s")
+        time.sleep(latency)
+
+        answers = [{**reply[0], 'id': call.get('id')} for call, reply in zip(calls, replies)]
+        return _RecordedResponse(answers if isinstance(payload, list) else answers[0])
+
+    def handshake_counts(self) -> Tuple[int, int]:
+        return 0, 0
+
+    def close(self) -> None:
+        pass
+
+
+class ReplayReachability(ReachabilitySweeper):
+    """Reachability sweeper answering from the probes in a trace.
+
+    Radios never probed in the trace count as reachable if they were talked
+    to, so traces recorded without probes still replay.
+    """
+
+    def __init__(self, events: Iterable[Dict], hosts: Iterable[str], latency_scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_scale = latency_scale
+        self.hosts = set(hosts)
+        self._recorded: Dict[str, Deque[Tuple[bool, float]]] = {}  # {ip_address: deque of (reachable, sweep rtt)}
+        for event in events:
+            for ip_address, reachable in event.get('probe', {}).items():
+                self._recorded.setdefault(ip_address, deque()).append((reachable, event['rtt']))
+
+    def _probe(self, ip_addresses: Iterable[str], deadline: float) -> Dict[str, bool]:
+        results = {}
+        latency = 0.0
+        with self._lock:
+            for ip_address in ip_addresses:
+                recorded = self._recorded.get(ip_address)
+                if recorded:
+                    reachable, rtt = _next(recorded)
+                    latency = max(latency, rtt)
+                else:
+                    reachable = ip_address in self.hosts
+                results[ip_address] = reachable
+        time.sleep(max(0.0, min(latency * self.latency_scale, deadline - time.monotonic())))
+        return results
+
+
+def _root_ip(events: List[Dict]) -> Optional[str]:
+    """The radio the recording logged in to first, which is the root of the mesh."""
+    for event in events:
+        if 'ip' in event and any(_signature(call) == ('session', 'login') for call in _calls(event['req'])):
+            return event['ip']
+    return None
+
+
+def main() -> int:
+    import argparse
+    import cProfile
+    import logging
+    import pstats
+
+    parser = argparse.ArgumentParser(description='Replay a recorded ubus trace through discovery and polling.')
+    parser.add_argument('trace', help='Trace written with --record-trace.')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiplier applied to recorded round-trip times; 0 replays as fast as possible.')
+    parser.add_argument('--polls', type=int, default=3, help='Poll cycles replayed after discovery.')
+    parser.add_argument('--root', default=None, help='Root radio address; defaults to the first radio logged in to.')
+    parser.add_argument('--subnet', default=None, help='First two octets of the mesh; defaults to those of the root.')
+    parser.add_argument('--profile', action='store_true', help='Print the functions replay time was spent in.')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log radio errors to stderr.')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if options.verbose else logging.CRITICAL, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('ubus_trace')
+
+    header, events = load_trace(options.trace)
+    root_ip = options.root or _root_ip(events)
+    if root_ip is None:
+        print(f"{options.trace} has no login to take the root radio from; pass --root", file=sys.stderr)
+        return 1
+    subnet = options.subnet or '.'.join(root_ip.split('.')[:2])
+
+    transport = ReplayTransport(events, latency_scale=options.latency_scale)
+    reachability = ReplayReachability(events, transport.hosts, latency_scale=options.latency_scale,
+                                      port=UBUS_PORT)
+    station_discovery = StationDiscovery(logger, mesh_subnet=subnet, transport=transport, reachability=reachability)
+    root_station = DoodleHelper(root_ip, 'replay', REDACTED, logger, session_registry=station_discovery.session_registry,
+                                transport=transport)
+    print(f"Replaying {len(events)} events recorded {time.ctime(header['started'])} from root {root_ip}")
+
+    profiler = cProfile.Profile() if options.profile else None
+    if profiler is not None:
+        profiler.enable()
+    started = time.perf_counter()
+    root_station.login()
+    readings = station_discovery.update_station_cache(root_station)
+    print(f"discovery  {time.perf_counter() - started:8.3f}s  {len(station_discovery.discovered_stations)} radios, "
+          f"{len(readings)} readings")
+    for poll in range(1, options.polls + 1):
+        started = time.perf_counter()
+        readings = station_discovery.get_station_voltages(root_station)
+        print(f"poll {poll:<5} {time.perf_counter() - started:8.3f}s  {len(readings)} readings")
+    if profiler is not None:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(25)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import math
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from doodle_helper import BATTERY_VOLTAGE_MAX, BATTERY_VOLTAGE_MIN
+
+HISTORY_CAPACITY = 960  # samples kept per radio
+HISTORY_SAMPLE_INTERVAL = 30.0  # seconds; with the capacity above this keeps 8 hours per radio
+FIT_WINDOW = 3600.0  # seconds of history used to fit the discharge rate
+MIN_FIT_SAMPLES = 4  # samples needed in the fit window before a rate is reported
+INITIAL_ROWS = 64  # radios the buffers are sized for before they first grow
+
+
+class VoltageHistory:
+    """Fixed-memory ring buffers of timestamped voltages, one row per radio.
+
+    All radios share two 2-D arrays so discharge rates can be fitted for the
+    whole mesh in a handful of vectorized operations. Memory is bounded by
+    rows x HISTORY_CAPACITY x 12 bytes, about 6 MB for 500 radios.
+    """
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY, sample_interval: float = HISTORY_SAMPLE_INTERVAL,
+                 fit_window: float = FIT_WINDOW):
+        self.capacity = capacity
+        self.sample_interval = sample_interval
+        self.fit_window = fit_window
+        self._rows: Dict[str, int] = {}  # {mac_address: row index}
+        self._free_rows: List[int] = []
+        self._timestamps = np.full((INITIAL_ROWS, capacity), np.nan, dtype=np.float64)
+        self._voltages = np.full((INITIAL_ROWS, capacity), np.nan, dtype=np.float32)
+        self._next_slot = np.zeros(INITIAL_ROWS, dtype=np.int32)
+        self._last_recorded = np.full(INITIAL_ROWS, -np.inf, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def _grow(self) -> None:
+        rows = self._timestamps.shape[0]
+        self._timestamps = np.vstack([self._timestamps, np.full((rows, self.capacity), np.nan, dtype=np.float64)])
+        self._voltages = np.vstack([self._voltages, np.full((rows, self.capacity), np.nan, dtype=np.float32)])
+        self._next_slot = np.concatenate([self._next_slot, np.zeros(rows, dtype=np.int32)])
+        self._last_recorded = np.concatenate([self._last_recorded, np.full(rows, -np.inf, dtype=np.float64)])
+
+    def _row_for(self, mac_address: str) -> int:
+        row = self._rows.get(mac_address)
+        if row is not None:
+            return row
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._rows)
+            if row >= self._timestamps.shape[0]:
+                self._grow()
+        self._rows[mac_address] = row
+        return row
+
+    def _clear_row(self, row: int) -> None:
+        self._timestamps[row] = np.nan
+        self._voltages[row] = np.nan
+        self._next_slot[row] = 0
+        self._last_recorded[row] = -np.inf
+
+    def record(self, mac_address: str, timestamp: float, voltage: float) -> None:
+        """Store a reading unless one was already stored for this radio within the sample interval."""
+        with self._lock:
+            row = self._row_for(mac_address)
+            if timestamp - self._last_recorded[row] < self.sample_interval:
+                return
+            slot = self._next_slot[row]
+            self._timestamps[row, slot] = timestamp
+            self._voltages[row, slot] = voltage
+            self._next_slot[row] = (slot + 1) % self.capacity
+            self._last_recorded[row] = timestamp
+
+    def record_readings(self, readings: Iterable[Mapping]) -> None:
+        """Store a batch of station readings, each at the time it was taken."""
+        for reading in readings:
+            self.record(reading['mac_address'], reading['timestamp'], reading['voltage'])
+
+    def retain(self, mac_addresses: Iterable[str]) -> None:
+        """Drop the history of every radio not in mac_addresses, freeing their rows for reuse."""
+        keep = set(mac_addresses)
+        with self._lock:
+            for mac_address in [mac for mac in self._rows if mac not in keep]:
+                row = self._rows.pop(mac_address)
+                self._clear_row(row)
+                self._free_rows.append(row)
+
+    def discharge_trends(self, now: float) -> Dict[str, Tuple[float, Optional[float]]]:
+        """Fit a line through each radio's recent voltages.
+
+        Returns {mac_address: (discharge rate in %/h, hours until empty)}. The
+        rate is positive while draining; time to empty is None unless draining.
+        Radios without enough samples in the fit window are left out.
+        """
+        with self._lock:
+            if not self._rows:
+                return {}
+            rows = np.fromiter(self._rows.values(), dtype=np.intp, count=len(self._rows))
+            macs = list(self._rows.keys())
+            # Centre timestamps on now so the sums stay well conditioned
+            t = self._timestamps[rows] - now
+            v = self._voltages[rows].astype(np.float64)
+
+        mask = ~np.isnan(v) & (t >= -self.fit_window)
+        count = mask.sum(axis=1)
+        t = np.where(mask, t, 0.0)
+        v = np.where(mask, v, 0.0)
+        sum_t = t.sum(axis=1)
+        sum_v = v.sum(axis=1)
+        denom = count * (t * t).sum(axis=1) - sum_t * sum_t
+
+        valid = (count >= MIN_FIT_SAMPLES) & (denom > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(valid, (count * (t * v).sum(axis=1) - sum_t * sum_v) / denom, np.nan)  # V/s
+            voltage_now = np.where(valid, (sum_v - slope * sum_t) / count, np.nan)
+            drain_per_hour = 0.0 - slope * 3600.0  # V/h, positive while draining
+            hours_to_empty = (voltage_now - BATTERY_VOLTAGE_MIN) / drain_per_hour
+
+        drain_rate = drain_per_hour * (100.0 / (BATTERY_VOLTAGE_MAX - BATTERY_VOLTAGE_MIN))
+
+        trends = {}
+        for index in np.flatnonzero(valid):
+            time_to_empty = float(hours_to_empty[index]) if slope[index] < 0 else None
+            if time_to_empty is not None and not math.isfinite(time_to_empty):
+                time_to_empty = None
+            trends[macs[index]] = (float(drain_rate[index]), max(0.0, time_to_empty) if time_to_empty is not None else None)
+        return trends